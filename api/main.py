@@ -1,7 +1,13 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional, List
+from fastapi.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict, Any, Tuple
+from urllib.parse import parse_qsl, urlencode
+from datetime import datetime
+import asyncio
+import json
 import os
 import sys
 # Add the parent directory to the Python path
@@ -9,9 +15,79 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Now import from src
 from src.db import Database
+from src.sharding import ShardMoving, ShardRouter, connect
 from src.logic import BookingLogic, SlotManagement
+from src.cache import request_scope, read_cache, single_flight, checked_read
+from src.scheduler import Scheduler
+from src import filelock
+from src.notifications import NotificationDispatcher, plan_reminders, transport_from_env
+from api.responses import (FastJSONResponse, SlotsResponse, NearbySlotsResponse, BookingsResponse,
+                           UserDashboardResponse, AdminDashboardResponse)
+from src.spatial import SlotIndex
+from src.events import EventLog
+from src.models import Slot
+from src.filters import FilterError, parse_filters, parse_sort, BOOKING_FILTERS, BOOKING_SORTS, SLOT_FILTERS, SLOT_SORTS
 
-app = FastAPI(title="EV Charging Slot Booking API", version="1.0.0")
+# Background jobs: confirmed bookings that started (or, without a start time, were made)
+# more than this many hours ago are completed and their slots freed
+BOOKING_EXPIRY_HOURS = float(os.getenv("BOOKING_EXPIRY_HOURS", "12"))
+# Reminders are queued for bookings starting within this many minutes
+REMINDER_LEAD_MINUTES = int(os.getenv("REMINDER_LEAD_MINUTES", "30"))
+# Cancelled and completed bookings older than this many days move to the archive
+BOOKING_ARCHIVE_DAYS = float(os.getenv("BOOKING_ARCHIVE_DAYS", "90"))
+
+scheduler = Scheduler()
+slot_index = SlotIndex()
+event_log = EventLog()
+Database.subscribe(event_log.append)
+Database.subscribe(slot_index.apply)
+# Events replayed from the shared log carry other workers' writes into this process
+event_log.subscribe(slot_index.apply)
+
+def bootstrap_events() -> List[Tuple[str, Dict[str, Any]]]:
+    """Seed events from the current tables, used once when the event log is new"""
+    events = [("slot_created", {"slot": slot}) for slot in db.get_all_slots()]
+    for booking in db.get_all_bookings():
+        events.append(("booking_created", {"booking_id": booking.id, "user_id": booking.user_id, "slot_id": booking.slot_id}))
+        if booking.booking_status != "confirmed":
+            events.append(("booking_status", {"booking_ids": [booking.id], "status": booking.booking_status}))
+    return events
+
+def restore_derived_state() -> int:
+    """Load the latest snapshot, replay the log tail and rebuild the slot index from the result"""
+    replayed = event_log.restore(bootstrap_events)
+    slot_index.rebuild(Slot.from_row({"id": slot_id, **fields}) for slot_id, fields in event_log.state.slots.items())
+    return replayed
+
+def resync_slot_index() -> int:
+    """Rebuild the slot index from charging_slots, picking up rows written outside the API"""
+    slots, ok = checked_read(db.get_all_slots)
+    if ok:
+        slot_index.rebuild(slots)
+    return len(slot_index)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await run_in_threadpool(restore_derived_state)
+    # Per-process state: these run in every worker
+    scheduler.add_job("tail_event_log", event_log.catch_up, interval=2, exclusive=False)
+    scheduler.add_job("resync_slot_index", resync_slot_index, interval=300, exclusive=False)
+    scheduler.add_job("refresh_admin_dashboard", booking_logic.refresh_admin_dashboard, interval=60, exclusive=False)
+    scheduler.add_job("purge_read_cache", read_cache.purge_expired, interval=30, exclusive=False)
+    # Shared work: one worker per interval
+    scheduler.add_job("complete_stale_bookings", lambda: booking_logic.complete_stale_bookings(BOOKING_EXPIRY_HOURS), interval=300)
+    scheduler.add_job("plan_reminders", lambda: plan_reminders(db, REMINDER_LEAD_MINUTES), interval=60)
+    scheduler.add_job("dispatch_notifications", notification_dispatcher.dispatch, interval=5)
+    scheduler.add_job("snapshot_event_log", event_log.snapshot, interval=300)
+    scheduler.add_job("archive_bookings", lambda: booking_logic.archive_finished_bookings(BOOKING_ARCHIVE_DAYS), interval=3600)
+    scheduler.start()
+    yield
+    await scheduler.stop()
+
+app = FastAPI(title="EV Charging Slot Booking API", version="1.0.0", lifespan=lifespan)
+
+# Maximum number of sub-requests accepted by /batch
+MAX_BATCH_SIZE = 20
 
 # CORS middleware
 app.add_middleware(
@@ -22,6 +98,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(ShardMoving)
+async def shard_moving_handler(request: Request, exc: ShardMoving):
+    """Writes to a location being moved between shards are rejected until the move ends"""
+    return FastJSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": str(exc.retry_after)})
+
 # Pydantic models
 class UserCreate(BaseModel):
     username: str
@@ -35,23 +116,46 @@ class UserLogin(BaseModel):
 class SlotCreate(BaseModel):
     location: str
     slot_number: int
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
 
 class BookingCreate(BaseModel):
     slot_id: str
     vehicle_number: str
     vehicle_type: Optional[str] = None
+    start_time: Optional[datetime] = None
 
 class BookingUpdate(BaseModel):
     booking_status: str
 
+class BulkBookingCancel(BaseModel):
+    booking_ids: List[str]
+
+class BulkSlotDelete(BaseModel):
+    slot_ids: List[str]
+
+class ShardMove(BaseModel):
+    location: str
+    shard: str
+
+class BatchItem(BaseModel):
+    method: str = "GET"
+    path: str
+    params: Dict[str, Any] = {}
+    body: Optional[Any] = None
+
+class BatchRequest(BaseModel):
+    requests: List[BatchItem] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
 # Initialize services
-db = Database()
+db = connect()
 booking_logic = BookingLogic()
 slot_management = SlotManagement()
+notification_dispatcher = NotificationDispatcher(db, transport_from_env())
 
 # Authentication endpoints
 @app.post("/register")
-async def register(user: UserCreate):
+def register(user: UserCreate):
     """Register a new user"""
     existing_user = db.get_user_by_username(user.username)
     if existing_user:
@@ -59,55 +163,79 @@ async def register(user: UserCreate):
     
     new_user = db.create_user(user.username, user.password, user.role)
     if new_user:
-        return {"message": "User registered successfully", "user_id": new_user["id"]}
+        return {"message": "User registered successfully", "user_id": new_user.id}
     else:
         raise HTTPException(status_code=500, detail="Failed to register user")
 
 @app.post("/login")
-async def login(credentials: UserLogin):
+def login(credentials: UserLogin):
     """User login"""
     user = db.get_user_by_username(credentials.username)
-    if not user or user["password"] != credentials.password:
+    if not user or user.password != credentials.password:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    if not user.get("is_active", True):
+    if not user.is_active:
         raise HTTPException(status_code=401, detail="Account is inactive")
     
     return {
         "message": "Login successful",
-        "user_id": user["id"],
-        "username": user["username"],
-        "role": user["role"]
+        "user_id": user.id,
+        "username": user.username,
+        "role": user.role
     }
 
 # Slot endpoints
-@app.get("/slots")
-async def get_slots(available_only: bool = False):
-    """Get all slots or available slots only"""
+@app.get("/slots", response_model=SlotsResponse, response_class=FastJSONResponse)
+def get_slots(available_only: bool = False, location: Optional[str] = None,
+              filter_: List[str] = Query([], alias="filter"), sort: Optional[str] = None,
+              limit: Optional[int] = Query(None, ge=1, le=500), offset: int = Query(0, ge=0)):
+    """Get all slots or available slots only, optionally filtered, sorted and paginated
+    
+    filter terms look like `field:op:value` (e.g. `location:in:Mall|Airport`) and sort
+    like `-created_at,slot_number`; both are limited to the fields in src/filters.py.
+    """
+    terms = list(filter_)
+    if location:
+        terms.append(f"location:eq:{location}")
+    if terms or sort or limit is not None:
+        if available_only:
+            terms.append("available:eq:true")
+        try:
+            filters, sort_keys = parse_filters(terms, SLOT_FILTERS), parse_sort(sort, SLOT_SORTS)
+        except FilterError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return FastJSONResponse(db.list_slots(filters, sort_keys, limit, offset))
     if available_only:
         slots = booking_logic.get_available_slots()
     else:
         slots = db.get_all_slots()
-    return {"slots": slots}
+    return FastJSONResponse({"slots": slots})
+
+@app.get("/slots/nearby", response_model=NearbySlotsResponse, response_class=FastJSONResponse)
+def get_nearby_slots(lat: float = Query(..., ge=-90, le=90), lon: float = Query(..., ge=-180, le=180),
+                     radius: float = Query(10, gt=0, le=500), limit: int = Query(5, ge=1, le=50)):
+    """Nearest available slots to a point, closest first (radius in km)"""
+    nearest = slot_index.nearest(lat, lon, radius, limit)
+    return FastJSONResponse({"slots": [{"slot": slot, "distance_km": round(distance, 3)} for distance, slot in nearest]})
 
 @app.post("/slots")
-async def create_slot(slot: SlotCreate, user_id: str):
+def create_slot(slot: SlotCreate, user_id: str):
     """Create a new slot (admin only)"""
     user = db.get_user_by_id(user_id)
-    if not user or user.get("role") != "admin":
+    if not user or user.role != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    result = slot_management.create_slot(slot.location, slot.slot_number)
+    result = slot_management.create_slot(slot.location, slot.slot_number, slot.latitude, slot.longitude)
     if result["success"]:
         return result
     else:
         raise HTTPException(status_code=400, detail=result["message"])
 
 @app.delete("/slots/{slot_id}")
-async def delete_slot(slot_id: str, user_id: str):
+def delete_slot(slot_id: str, user_id: str):
     """Delete a slot (admin only)"""
     user = db.get_user_by_id(user_id)
-    if not user or user.get("role") != "admin":
+    if not user or user.role != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
     result = slot_management.delete_slot(slot_id)
@@ -116,36 +244,74 @@ async def delete_slot(slot_id: str, user_id: str):
     else:
         raise HTTPException(status_code=400, detail=result["message"])
 
+@app.post("/slots/bulk-delete")
+def delete_slots(request: BulkSlotDelete, user_id: str):
+    """Delete several slots in one call (admin only)"""
+    user = db.get_user_by_id(user_id)
+    if not user or user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    result = slot_management.delete_slots(request.slot_ids)
+    if result["success"]:
+        return result
+    else:
+        raise HTTPException(status_code=400, detail=result["message"])
+
 # Booking endpoints
-@app.get("/bookings")
-async def get_bookings(user_id: str, admin_view: bool = False):
-    """Get bookings - user's own or all (admin)"""
+@app.get("/bookings", response_model=BookingsResponse, response_class=FastJSONResponse)
+def get_bookings(user_id: str, admin_view: bool = False, status: Optional[str] = None,
+                 location: Optional[str] = None, date_from: Optional[str] = None,
+                 date_to: Optional[str] = None, filter_: List[str] = Query([], alias="filter"), sort: Optional[str] = None,
+                 limit: Optional[int] = Query(None, ge=1, le=500), offset: int = Query(0, ge=0),
+                 include_archive: bool = False):
+    """Get bookings - user's own or all (admin), optionally filtered, sorted and paginated
+    
+    filter terms look like `field:op:value` (e.g. `status:in:cancelled|completed`,
+    `created_at:gte:2025-01-01`) and sort like `-created_at`; both are limited to the
+    fields in src/filters.py. status, location, date_from and date_to are shorthands.
+    include_archive adds archived (old finished) bookings to the results.
+    """
     user = db.get_user_by_id(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    if admin_view and user.get("role") == "admin":
-        bookings = db.get_all_bookings()
+    terms = list(filter_)
+    for shorthand in (f"status:eq:{status}" if status else None, f"location:eq:{location}" if location else None,
+                      f"created_at:gte:{date_from}" if date_from else None, f"created_at:lte:{date_to}" if date_to else None):
+        if shorthand:
+            terms.append(shorthand)
+    is_admin = admin_view and user.role == "admin"
+    if terms or sort or limit is not None:
+        try:
+            filters, sort_keys = parse_filters(terms, BOOKING_FILTERS), parse_sort(sort, BOOKING_SORTS)
+        except FilterError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if not is_admin:
+            filters += (("user_id", "eq", user_id),)
+        return FastJSONResponse(db.list_bookings(filters, sort_keys, limit, offset, include_archive))
+    if is_admin:
+        bookings = db.get_all_bookings(include_archive)
     else:
-        bookings = db.get_user_bookings(user_id)
+        bookings = db.get_user_bookings(user_id, include_archive)
     
-    return {"bookings": bookings}
+    return FastJSONResponse({"bookings": bookings})
 
 @app.post("/bookings")
-async def create_booking(booking: BookingCreate, user_id: str = None):
+def create_booking(booking: BookingCreate, user_id: str = None):
     """Create a new booking"""
     # Check if user_id was provided as query parameter
     if not user_id:
         raise HTTPException(status_code=400, detail="User ID is required")
     
-    result = booking_logic.create_booking(user_id, booking.slot_id, booking.vehicle_number, booking.vehicle_type)
+    start_time = booking.start_time.isoformat() if booking.start_time else None
+    result = booking_logic.create_booking(user_id, booking.slot_id, booking.vehicle_number, booking.vehicle_type, start_time)
     if result["success"]:
         return result
     else:
         raise HTTPException(status_code=400, detail=result["message"])
 
 @app.put("/bookings/{booking_id}/cancel")
-async def cancel_booking(booking_id: str, user_id: str):
+def cancel_booking(booking_id: str, user_id: str):
     """Cancel a booking"""
     result = booking_logic.cancel_booking(booking_id, user_id)
     if result["success"]:
@@ -153,22 +319,150 @@ async def cancel_booking(booking_id: str, user_id: str):
     else:
         raise HTTPException(status_code=400, detail=result["message"])
 
+@app.post("/bookings/bulk-cancel")
+def cancel_bookings(request: BulkBookingCancel, user_id: str):
+    """Cancel several bookings in one call (admin only)"""
+    result = booking_logic.cancel_bookings(request.booking_ids, user_id)
+    if result["success"]:
+        return result
+    else:
+        raise HTTPException(status_code=400, detail=result["message"])
+
 # Dashboard endpoints
-@app.get("/dashboard/user/{user_id}")
-async def get_user_dashboard(user_id: str):
-    """Get user dashboard data"""
-    dashboard_data = booking_logic.get_user_dashboard(user_id)
-    return dashboard_data
-
-@app.get("/dashboard/admin")
-async def get_admin_dashboard(user_id: str):
+@app.get("/dashboard/user/{user_id}", response_model=UserDashboardResponse, response_class=FastJSONResponse)
+def get_user_dashboard(user_id: str, include_archive: bool = False):
+    """Get user dashboard data, with archived past bookings when include_archive is set"""
+    dashboard_data = booking_logic.get_user_dashboard(user_id, include_archive)
+    return FastJSONResponse(dashboard_data)
+
+@app.get("/dashboard/admin", response_model=AdminDashboardResponse, response_class=FastJSONResponse)
+def get_admin_dashboard(user_id: str):
     """Get admin dashboard data"""
     user = db.get_user_by_id(user_id)
-    if not user or user.get("role") != "admin":
+    if not user or user.role != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
     dashboard_data = booking_logic.get_admin_dashboard()
-    return dashboard_data
+    return FastJSONResponse(dashboard_data)
+
+@app.get("/admin/metrics")
+def get_metrics(user_id: str):
+    """Background job timings, notification throughput, event log state and read coalescing (admin only)"""
+    user = db.get_user_by_id(user_id)
+    if not user or user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return {
+        "scheduler": scheduler.metrics(),
+        "notifications": notification_dispatcher.metrics(),
+        "event_log": event_log.metrics(),
+        "single_flight": single_flight.metrics(),
+    }
+
+# Shard endpoints
+@app.get("/admin/shards")
+def get_shards(user_id: str):
+    """Configured shards and location assignments (admin only)"""
+    user = db.get_user_by_id(user_id)
+    if not user or user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    if not isinstance(db, ShardRouter):
+        raise HTTPException(status_code=404, detail="Sharding is not configured")
+    
+    return db.shards()
+
+@app.post("/admin/shards/move")
+def move_location(move: ShardMove, user_id: str):
+    """Move a location's slots and bookings to another shard (admin only)"""
+    user = db.get_user_by_id(user_id)
+    if not user or user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    if not isinstance(db, ShardRouter):
+        raise HTTPException(status_code=404, detail="Sharding is not configured")
+    
+    result = db.move_location(move.location, move.shard)
+    if result["success"]:
+        return result
+    else:
+        raise HTTPException(status_code=400, detail=result["message"])
+
+# Batch endpoint
+async def _dispatch(item: BatchItem, user_id: str) -> Dict[str, Any]:
+    """Run one batch item through the app in-process and capture its response"""
+    # A query string in path is merged with params; user_id is always the caller's
+    path, _, query = item.path.partition("?")
+    if not path.startswith("/") or path == "/batch":
+        return {"status": 400, "body": {"detail": "Invalid batch path"}}
+    
+    body = b"" if item.body is None else json.dumps(item.body).encode()
+    params = [(k, v) for k, v in parse_qsl(query, keep_blank_values=True) if k != "user_id"]
+    params += [(k, v) for k, v in item.params.items() if k != "user_id"] + [("user_id", user_id)]
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": item.method.upper(),
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": urlencode(params, doseq=True).encode(),
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": None,
+        "server": None,
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+    
+    status, chunks = 500, []
+    
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+    
+    try:
+        await app(scope, receive, send)
+    except Exception as e:
+        # A failing item must not take the other items of the batch down with it
+        print(f"Error in batch item {item.method} {item.path}: {e}")
+        return {"status": 500, "body": {"detail": "Internal Server Error"}}
+    raw = b"".join(chunks)
+    try:
+        return {"status": status, "body": json.loads(raw) if raw else None}
+    except ValueError:
+        return {"status": status, "body": raw.decode(errors="replace")}
+
+@app.post("/batch")
+async def batch(request: BatchRequest, user_id: str):
+    """Execute several API operations in one round trip
+    
+    Consecutive GET items run concurrently; any other method runs on its own,
+    in order, so writes are never reordered with the reads around them. All
+    items share the caller's user_id and one request-scoped read cache.
+    """
+    responses = []
+    with request_scope():
+        # One auth lookup; sub-requests re-reading this user hit the shared cache
+        user = await run_in_threadpool(db.get_user_by_id, user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        
+        pending = []
+        for item in request.requests:
+            if item.method.upper() == "GET":
+                pending.append(item)
+                continue
+            responses += await asyncio.gather(*(_dispatch(i, user_id) for i in pending))
+            pending = []
+            responses.append(await _dispatch(item, user_id))
+        responses += await asyncio.gather(*(_dispatch(i, user_id) for i in pending))
+    
+    return {"responses": responses}
 
 @app.get("/")
 async def root():
@@ -176,4 +470,14 @@ async def root():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # API_WORKERS > 1 runs several processes; their read caches stay coherent
+    # through the shared version counters in src/coherence.py
+    workers = int(os.getenv("API_WORKERS", "1"))
+    if workers > 1 and not filelock.AVAILABLE:
+        # Without file locks every worker would run the exclusive jobs, e.g. send each email once per worker
+        sys.exit("API_WORKERS > 1 needs fcntl or msvcrt file locks, which this platform lacks")
+    if workers > 1:
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=workers,
+                    app_dir=os.path.dirname(os.path.abspath(__file__)))
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
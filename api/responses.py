@@ -0,0 +1,87 @@
+import dataclasses
+import json
+from datetime import datetime
+from typing import Any, List, Optional
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+class FastJSONResponse(JSONResponse):
+    """JSON response for data that is already JSON-ready
+    
+    Handlers return this directly, so FastAPI skips response-model validation and the
+    recursive jsonable_encoder pass; the declared response_model is used for docs only.
+    Uses orjson when installed, which handles the src.models records natively, and
+    falls back to compact json.dumps.
+    """
+    
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content)
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_encode_record).encode("utf-8")
+
+def _encode_record(obj: Any) -> Any:
+    """json.dumps fallback for the slotted records and their timestamps"""
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if dataclasses.is_dataclass(obj):
+        return {name: getattr(obj, name) for name in obj.__slots__}
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+# Response models
+class SlotOut(BaseModel):
+    id: str
+    location: str
+    slot_number: int
+    is_available: bool
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    created_at: Optional[datetime] = None
+
+class BookingUserOut(BaseModel):
+    username: str
+
+class BookingOut(BaseModel):
+    id: str
+    user_id: str
+    slot_id: str
+    vehicle_number: str
+    vehicle_type: Optional[str] = None
+    booking_status: str
+    start_time: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    cancelled_at: Optional[datetime] = None
+    users: Optional[BookingUserOut] = None
+    charging_slots: Optional[SlotOut] = None
+
+class SlotsResponse(BaseModel):
+    slots: List[SlotOut]
+    total: Optional[int] = None
+
+class NearbySlotOut(BaseModel):
+    slot: SlotOut
+    distance_km: float
+
+class NearbySlotsResponse(BaseModel):
+    slots: List[NearbySlotOut]
+
+class BookingsResponse(BaseModel):
+    bookings: List[BookingOut]
+    total: Optional[int] = None
+
+class UserDashboardResponse(BaseModel):
+    upcoming_bookings: List[BookingOut]
+    past_bookings: List[BookingOut]
+    total_bookings: int
+
+class AdminDashboardResponse(BaseModel):
+    total_slots: int
+    available_slots: int
+    booked_slots: int
+    today_bookings: List[BookingOut]
+    all_bookings: List[BookingOut]
@@ -0,0 +1,66 @@
+"""Benchmark: warm start from the event log with 1M historical bookings
+
+Builds a log of 1M booking_created events (two thirds later cancelled or
+completed) over 500 slots, snapshots it with a tail of recent events left
+unsnapshotted, then compares a restart from snapshot + tail against a full
+replay of the log.
+
+Run from the project root: python benchmarks/bench_event_log_restart.py [n_bookings]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.events import EventLog
+
+N_SLOTS = 500
+TAIL = 10_000
+
+def write_history(log, n_bookings):
+    for i in range(N_SLOTS):
+        log.append("slot_created", {"slot": {"id": f"slot-{i}", "location": f"Station {i % 40}", "slot_number": i % 12 + 1,
+                                             "latitude": 17.0 + i / 1000, "longitude": 78.0 + i / 1000, "is_available": True}})
+    for i in range(n_bookings):
+        booking_id = str(uuid.uuid4())
+        log.append("booking_created", {"booking_id": booking_id, "user_id": f"user-{i % 5000}", "slot_id": f"slot-{i % N_SLOTS}"})
+        if i % 3:
+            log.append("booking_status", {"booking_ids": [booking_id], "status": "completed" if i % 3 == 1 else "cancelled"})
+        if i == n_bookings - TAIL:
+            log.snapshot()
+
+def timed(label, func):
+    start = time.perf_counter()
+    result = func()
+    print(f"{label:<28} {time.perf_counter() - start:8.2f} s")
+    return result
+
+def main():
+    n_bookings = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    directory = tempfile.mkdtemp(prefix="ev_events_")
+    try:
+        log = EventLog(directory)
+        timed(f"write {n_bookings} bookings", lambda: write_history(log, n_bookings))
+        log_size = sum(os.path.getsize(log._segment_path(segment)) for segment in log._segments())
+        print(f"log size {log_size / 2**20:.1f} MiB, "
+              f"snapshot size {os.path.getsize(log.snapshot_path) / 2**20:.1f} MiB")
+        
+        warm = EventLog(directory)
+        replayed = timed("restart: snapshot + tail", warm.restore)
+        print(f"  replayed {replayed} tail records")
+        
+        # A single snapshot leaves the first segment in place, so the log can still be replayed in full
+        os.rename(warm.snapshot_path, warm.snapshot_path + ".off")
+        cold = EventLog(directory)
+        replayed = timed("restart: full replay", cold.restore)
+        print(f"  replayed {replayed} records")
+        assert warm.state.metrics() == cold.state.metrics()
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Microbenchmark: serialising a 10k-booking list response
+
+Compares FastAPI's generic path (jsonable_encoder + JSONResponse), the
+response_model path (pydantic validation + serialisation) and FastJSONResponse.
+
+Run from the project root: python benchmarks/bench_response_serialization.py
+"""
+import os
+import sys
+import time
+import uuid
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from api.responses import BookingsResponse, FastJSONResponse
+from src.models import bookings_from_rows
+
+N_BOOKINGS = 10_000
+ROUNDS = 5
+
+def make_bookings(n):
+    """Rows shaped like Database.get_all_bookings() output"""
+    bookings = []
+    for i in range(n):
+        slot_id = str(uuid.uuid4())
+        bookings.append({
+            "id": str(uuid.uuid4()),
+            "user_id": str(uuid.uuid4()),
+            "slot_id": slot_id,
+            "vehicle_number": f"AP01BB{i:04d}",
+            "vehicle_type": "Car",
+            "booking_status": "confirmed" if i % 3 else "cancelled",
+            "created_at": "2025-01-01T10:00:00+00:00",
+            "cancelled_at": None,
+            "users": {"username": f"user{i % 500}"},
+            "charging_slots": {
+                "id": slot_id,
+                "location": f"Station {i % 40}",
+                "slot_number": i % 12 + 1,
+                "is_available": False,
+                "created_at": "2024-12-01T08:00:00+00:00",
+            },
+        })
+    return bookings
+
+def bench(name, func):
+    best = float("inf")
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        body = func()
+        best = min(best, time.perf_counter() - start)
+    print(f"{name:<40} {best * 1000:8.1f} ms  ({len(body) / 1024:.0f} KiB)")
+
+def main():
+    content = {"bookings": make_bookings(N_BOOKINGS)}
+    print(f"{N_BOOKINGS} bookings, best of {ROUNDS}")
+    bench("jsonable_encoder + JSONResponse", lambda: JSONResponse(jsonable_encoder(content)).body)
+    bench("response_model + JSONResponse",
+          lambda: JSONResponse(BookingsResponse.model_validate(content).model_dump(mode="json")).body)
+    bench("FastJSONResponse", lambda: FastJSONResponse(content).body)
+    records = {"bookings": bookings_from_rows(content["bookings"])}
+    bench("FastJSONResponse (Booking records)", lambda: FastJSONResponse(records).body)
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,30 @@
 import streamlit as st
 import requests
+import functools
 import json
-from datetime import datetime
+import time
+from datetime import date, datetime
 import os
 
 # API configuration
 API_BASE_URL = "http://localhost:8000"
 
+# Client-side cache for GET requests: TTL in seconds per endpoint prefix
+CACHE_TTLS = {
+    "/slots": 15,
+    "/bookings": 30,
+    "/dashboard/": 30,
+}
+
+# Cached endpoint prefixes made stale by a successful mutation on a resource
+MUTATION_INVALIDATES = {
+    "/bookings": ("/bookings", "/slots", "/dashboard/"),
+    "/slots": ("/slots", "/bookings", "/dashboard/"),
+}
+
+# Rerun timings kept per session for the admin performance panel
+PERF_HISTORY_SIZE = 50
+
 # Page configuration
 st.set_page_config(
     page_title="EV Charging Slot Booking",
@@ -23,25 +41,161 @@ if 'role' not in st.session_state:
     st.session_state.role = None
 if 'logged_in' not in st.session_state:
     st.session_state.logged_in = False
+if 'api_cache' not in st.session_state:
+    st.session_state.api_cache = {}
+if 'run_requests' not in st.session_state:
+    st.session_state.run_requests = {}
+if 'perf_history' not in st.session_state:
+    st.session_state.perf_history = []
+
+def new_perf_run():
+    """Start recording timings for one script run"""
+    return {"started_at": datetime.now().strftime("%H:%M:%S"), "start": time.perf_counter(), "calls": [], "views": {}}
+
+def record_api_call(endpoint, method, source, started, size=0, status=None):
+    """Record one API call of this run; source is "network", "cache" or "run" (deduplicated)"""
+    run = st.session_state.get("perf_run")
+    if run is not None:
+        run["calls"].append({
+            "endpoint": endpoint,
+            "method": method,
+            "source": source,
+            "ms": round((time.perf_counter() - started) * 1000, 1),
+            "bytes": size,
+            "status": status,
+        })
+
+def render_view(name, view):
+    """Render a view and record how long it took, including its API calls"""
+    started = time.perf_counter()
+    try:
+        view()
+    finally:
+        st.session_state.perf_run["views"][name] = round((time.perf_counter() - started) * 1000, 1)
+
+def finish_perf_run():
+    """Summarise this run into the session's rolling history"""
+    run = st.session_state.perf_run
+    calls = run["calls"]
+    history = st.session_state.perf_history
+    history.append({
+        "time": run["started_at"],
+        "total_ms": round((time.perf_counter() - run["start"]) * 1000, 1),
+        "api_ms": round(sum(c["ms"] for c in calls if c["source"] == "network"), 1),
+        "api_calls": sum(1 for c in calls if c["source"] == "network"),
+        "cache_hits": sum(1 for c in calls if c["source"] != "network"),
+        "kb": round(sum(c["bytes"] for c in calls) / 1024, 1),
+        "views": ", ".join(f"{name} ({ms} ms)" for name, ms in run["views"].items()),
+    })
+    del history[:-PERF_HISTORY_SIZE]
+
+def fragment(func):
+    """Partial reruns: run a view as a Streamlit fragment when available, a plain function otherwise
+    
+    A fragment rerun skips main(), so it starts its own run here: fresh per-run request
+    de-duplication and its own entry in the performance history.
+    """
+    streamlit_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+    if streamlit_fragment is None:
+        return func
+    
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        if st.session_state.get("full_run"):
+            return func(*args, **kwargs)
+        st.session_state.run_requests = {}
+        st.session_state.perf_run = new_perf_run()
+        try:
+            render_view(func.__name__, lambda: func(*args, **kwargs))
+        finally:
+            finish_perf_run()
+    return streamlit_fragment(run)
+
+def perf_panel():
+    """Optional admin-only sidebar panel with this run's timings and recent history"""
+    if st.session_state.role != "admin" or not st.session_state.perf_history:
+        return
+    if not st.sidebar.checkbox("Show performance panel", key="show_perf_panel"):
+        return
+    
+    last = st.session_state.perf_history[-1]
+    st.sidebar.write("### Performance")
+    col1, col2 = st.sidebar.columns(2)
+    col1.metric("Rerun", f"{last['total_ms']:.0f} ms")
+    col2.metric("API", f"{last['api_ms']:.0f} ms")
+    col1.metric("Calls", last["api_calls"])
+    col2.metric("Cache hits", last["cache_hits"])
+    
+    run = st.session_state.perf_run
+    if run["views"]:
+        st.sidebar.write("**Views**")
+        st.sidebar.dataframe([{"view": name, "ms": ms} for name, ms in run["views"].items()],
+                             hide_index=True, use_container_width=True)
+    if run["calls"]:
+        st.sidebar.write("**API calls (slowest first)**")
+        st.sidebar.dataframe(sorted(run["calls"], key=lambda c: c["ms"], reverse=True),
+                             hide_index=True, use_container_width=True)
+    st.sidebar.write(f"**Last {len(st.session_state.perf_history)} reruns**")
+    st.sidebar.dataframe(list(reversed(st.session_state.perf_history)), hide_index=True, use_container_width=True)
+    if st.sidebar.button("Clear history", key="clear_perf_history"):
+        st.session_state.perf_history = []
 
 def check_api_health():
     """Check if the backend API is running"""
+    started = time.perf_counter()
     try:
         response = requests.get(f"{API_BASE_URL}/", timeout=5)
+        record_api_call("/", "GET", "network", started, len(response.content), response.status_code)
         return response.status_code == 200
     except:
+        record_api_call("/", "GET", "network", started)
         return False
 
+def _cache_ttl(endpoint):
+    """Return the cache TTL for a GET endpoint (0 means not cached)"""
+    for prefix, ttl in CACHE_TTLS.items():
+        if endpoint.startswith(prefix):
+            return ttl
+    return 0
+
+def _cache_key(endpoint, params):
+    """Build a cache key from the current user, endpoint and params"""
+    items = tuple(sorted((k, str(v)) for k, v in (params or {}).items()))
+    return (st.session_state.user_id, endpoint, items)
+
+def invalidate_api_cache(*prefixes):
+    """Drop cached responses for the given endpoint prefixes (all if none given)"""
+    cache = st.session_state.api_cache
+    st.session_state.run_requests = {}
+    if not prefixes:
+        cache.clear()
+        return
+    for key in [k for k in cache if k[1].startswith(prefixes)]:
+        del cache[key]
+
 def make_api_request(endpoint, method="GET", data=None, params=None):
     """Helper function to make API requests"""
+    started = time.perf_counter()
+    # Identical GETs within one script run share a single response
+    if method == "GET":
+        run_key = _cache_key(endpoint, params)
+        if run_key in st.session_state.run_requests:
+            record_api_call(endpoint, method, "run", started)
+            return st.session_state.run_requests[run_key]
+    
+    ttl = _cache_ttl(endpoint) if method == "GET" else 0
+    if ttl:
+        key = _cache_key(endpoint, params)
+        cached = st.session_state.api_cache.get(key)
+        if cached and cached[0] > time.monotonic():
+            st.session_state.run_requests[key] = cached[1]
+            record_api_call(endpoint, method, "cache", started)
+            return cached[1]
+    
+    response = None
     try:
         url = f"{API_BASE_URL}{endpoint}"
         
-        # Debug output
-        print(f"Making {method} request to {url}")
-        print(f"Params: {params}")
-        print(f"Data: {data}")
-        
         if method == "GET":
             response = requests.get(url, params=params, timeout=10)
         elif method == "POST":
@@ -55,11 +209,16 @@ def make_api_request(endpoint, method="GET", data=None, params=None):
             st.error(f"Unsupported HTTP method: {method}")
             return None
         
-        print(f"Response status: {response.status_code}")
-        print(f"Response content: {response.text}")
-        
         if response.status_code == 200:
-            return response.json()
+            result = response.json()
+            if method == "GET":
+                st.session_state.run_requests[run_key] = result
+            if ttl:
+                st.session_state.api_cache[key] = (time.monotonic() + ttl, result)
+            elif method != "GET":
+                resource = "/" + endpoint.lstrip("/").split("/", 1)[0]
+                invalidate_api_cache(*MUTATION_INVALIDATES.get(resource, ()))
+            return result
         else:
             try:
                 error_detail = response.json().get('detail', 'Unknown error')
@@ -73,6 +232,21 @@ def make_api_request(endpoint, method="GET", data=None, params=None):
     except Exception as e:
         st.error(f"Unexpected error: {str(e)}")
         return None
+    finally:
+        if response is not None:
+            record_api_call(endpoint, method, "network", started, len(response.content), response.status_code)
+        else:
+            record_api_call(endpoint, method, "network", started)
+
+@functools.lru_cache(maxsize=4096)
+def format_timestamp(value):
+    """Format an API timestamp for display; each distinct value is parsed once"""
+    if not value:
+        return "Unknown"
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).strftime('%Y-%m-%d %H:%M')
+    except ValueError:
+        return "Unknown"
 
 def login(username, password):
     """User login"""
@@ -93,6 +267,7 @@ def logout():
     st.session_state.username = None
     st.session_state.role = None
     st.session_state.logged_in = False
+    invalidate_api_cache()
     st.rerun()
 
 def register(username, password, role="user"):
@@ -103,6 +278,13 @@ def register(username, password, role="user"):
     if result:
         st.success("Registration successful! Please login.")
 
+def rerun_view():
+    """Rerun only the current fragment when supported, else the whole script"""
+    try:
+        st.rerun(scope="fragment")
+    except TypeError:
+        st.rerun()
+
 def user_dashboard():
     """User dashboard"""
     st.title("⚡ EV Charging Slot Booking")
@@ -115,6 +297,12 @@ def user_dashboard():
             logout()
         return
     
+    # Debug: Show current user info
+    st.sidebar.write("### Current User Info")
+    st.sidebar.write(f"User ID: {st.session_state.user_id}")
+    st.sidebar.write(f"Username: {st.session_state.username}")
+    st.sidebar.write(f"Role: {st.session_state.role}")
+    
     # Get dashboard data
     dashboard_data = make_api_request(f"/dashboard/user/{st.session_state.user_id}")
     
@@ -129,201 +317,215 @@ def user_dashboard():
     else:
         st.warning("Could not load dashboard data")
     
-    # Tabs for different functionalities
-    tab1, tab2, tab3, tab4 = st.tabs(["Book Slot", "My Bookings", "Available Slots", "Profile"])
+    # Only the selected view is rendered, so only its data is fetched
+    view = st.radio("View", list(USER_VIEWS), horizontal=True, key="user_view", label_visibility="collapsed")
+    render_view(view, USER_VIEWS[view])
+
+@fragment
+def user_book_slot_view():
+    """Booking form for available slots"""
+    st.header("Book a Charging Slot")
     
-    with tab1:
-        st.header("Book a Charging Slot")
-        
-        # Debug: Show current user info
-        st.sidebar.write("### Current User Info")
-        st.sidebar.write(f"User ID: {st.session_state.user_id}")
-        st.sidebar.write(f"Username: {st.session_state.username}")
-        st.sidebar.write(f"Role: {st.session_state.role}")
-        
+    # Optionally narrow the choice to the chargers nearest to the user
+    distances = {}
+    if st.checkbox("📍 Find chargers near me", key="nearby_enabled"):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            lat = st.number_input("Latitude", min_value=-90.0, max_value=90.0, value=17.385, format="%.5f", key="nearby_lat")
+        with col2:
+            lon = st.number_input("Longitude", min_value=-180.0, max_value=180.0, value=78.4867, format="%.5f", key="nearby_lon")
+        with col3:
+            radius = st.slider("Radius (km)", min_value=1, max_value=100, value=10, key="nearby_radius")
+        nearby_data = make_api_request("/slots/nearby", params={"lat": lat, "lon": lon, "radius": radius, "limit": 10})
+        nearby = nearby_data.get("slots", []) if nearby_data else []
+        available_slots = [item["slot"] for item in nearby]
+        distances = {item["slot"]["id"]: item["distance_km"] for item in nearby}
+    else:
         # Get available slots
         slots_data = make_api_request("/slots", params={"available_only": True})
         available_slots = slots_data.get("slots", []) if slots_data else []
-        
-        if available_slots:
-            with st.form("booking_form", clear_on_submit=True):
-                st.subheader("New Booking")
+    
+    if available_slots:
+        with st.form("booking_form", clear_on_submit=True):
+            st.subheader("New Booking")
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                # Create slot options with better formatting
+                slot_options = {}
+                for slot in available_slots:
+                    key = f"{slot['location']} - Slot {slot['slot_number']}"
+                    if slot['id'] in distances:
+                        key += f" ({distances[slot['id']]:.1f} km)"
+                    slot_options[key] = slot['id']
                 
-                col1, col2 = st.columns(2)
-                with col1:
-                    # Create slot options with better formatting
-                    slot_options = {}
-                    for slot in available_slots:
-                        key = f"{slot['location']} - Slot {slot['slot_number']}"
-                        slot_options[key] = slot['id']
-                    
-                    selected_slot_label = st.selectbox("Select Charging Slot", options=list(slot_options.keys()))
-                    slot_id = slot_options[selected_slot_label] if selected_slot_label else None
-                    
-                    vehicle_number = st.text_input("Vehicle Registration Number", 
-                                                 placeholder="AP01BB2006",
-                                                 max_chars=20)
-                    
-                with col2:
-                    vehicle_type = st.selectbox("Vehicle Type", 
-                                              ["Car", "Bike", "Scooter", "Truck", "Other"])
-                    
-                    booking_notes = st.text_area("Additional Notes", 
-                                               placeholder="E.g., Need fast charging support",
-                                               height=100)
+                selected_slot_label = st.selectbox("Select Charging Slot", options=list(slot_options.keys()))
+                slot_id = slot_options[selected_slot_label] if selected_slot_label else None
                 
-                st.write("---")
-                submit_button = st.form_submit_button("📅 Book Slot Now", type="primary")
+                vehicle_number = st.text_input("Vehicle Registration Number", 
+                                             placeholder="AP01BB2006",
+                                             max_chars=20)
                 
-                if submit_button:
-                    if not vehicle_number.strip():
-                        st.error("❌ Please enter your vehicle registration number")
-                    elif not slot_id:
-                        st.error("❌ Please select a charging slot")
-                    else:
-                        # Show loading spinner
-                        with st.spinner("Creating your booking..."):
-                            # Prepare booking data
-                            booking_data = {
-                                "slot_id": slot_id,
-                                "vehicle_number": vehicle_number.strip(),
-                                "vehicle_type": vehicle_type
-                            }
-                            
-                            # DEBUG: Show what's being sent
-                            with st.expander("🔧 Debug Information"):
-                                st.write("**Request Details:**")
-                                st.json({
-                                    "endpoint": "/bookings",
-                                    "method": "POST",
-                                    "params": {"user_id": st.session_state.user_id},
-                                    "data": booking_data
-                                })
-                            
-                            # Make the API request with user_id as query parameter
-                            result = make_api_request(
-                                "/bookings", 
-                                method="POST", 
-                                data=booking_data, 
-                                params={"user_id": st.session_state.user_id}
-                            )
-                            
-                            if result and result.get("success"):
-                                st.success("✅ Booking confirmed successfully!")
-                                st.balloons()
-                                st.info(f"Booking ID: {result.get('booking', {}).get('id', 'N/A')}")
-                                # Refresh the page to show updated slots
-                                st.rerun()
-                            else:
-                                error_msg = result.get('message', 'Unknown error') if result else 'No response from server'
-                                st.error(f"❌ Failed to create booking: {error_msg}")
-        
-        else:
-            st.info("📭 No available charging slots at the moment.")
-            st.write("Please check back later or contact administrator for more slots.")
-    
-    with tab2:
-        st.header("My Bookings")
-        
-        if dashboard_data:
-            upcoming = dashboard_data.get("upcoming_bookings", [])
-            past = dashboard_data.get("past_bookings", [])
+            with col2:
+                vehicle_type = st.selectbox("Vehicle Type", 
+                                          ["Car", "Bike", "Scooter", "Truck", "Other"])
+                
+                start_date = st.date_input("Charging Date", min_value=date.today())
+                start_clock = st.time_input("Start Time")
+                
+                booking_notes = st.text_area("Additional Notes", 
+                                           placeholder="E.g., Need fast charging support",
+                                           height=100)
             
-            st.subheader("Upcoming Bookings")
-            if upcoming:
-                for booking in upcoming:
-                    # Handle timestamp formatting safely
-                    created_at = booking.get('created_at')
-                    if created_at:
-                        try:
-                            # Remove 'Z' and add timezone offset if needed
-                            if 'Z' in created_at:
-                                created_at = created_at.replace('Z', '+00:00')
-                            formatted_time = datetime.fromisoformat(created_at).strftime('%Y-%m-%d %H:%M')
-                        except:
-                            formatted_time = "Unknown"
-                    else:
-                        formatted_time = "Unknown"
-                    
-                    with st.expander(f"Booking {booking['id'][:8]} - {booking.get('vehicle_number', 'N/A')}"):
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.write(f"**Slot:** {booking.get('charging_slots', {}).get('location', 'N/A')} - Slot {booking.get('charging_slots', {}).get('slot_number', 'N/A')}")
-                            st.write(f"**Vehicle:** {booking.get('vehicle_number', 'N/A')} ({booking.get('vehicle_type', 'N/A')})")
-                        with col2:
-                            st.write(f"**Status:** {booking.get('booking_status', 'N/A')}")
-                            st.write(f"**Booked on:** {formatted_time}")
-                        
-                        if booking.get('booking_status') == 'confirmed':
-                            if st.button("Cancel Booking", key=f"cancel_{booking['id']}"):
-                                result = make_api_request(f"/bookings/{booking['id']}/cancel", "PUT", params={"user_id": st.session_state.user_id})
-                                if result:
-                                    st.success("Booking cancelled successfully!")
-                                    st.rerun()
-            else:
-                st.info("No upcoming bookings.")
+            st.write("---")
+            submit_button = st.form_submit_button("📅 Book Slot Now", type="primary")
             
-            st.subheader("Past Bookings")
-            if past:
-                for booking in past:
-                    # Handle timestamp formatting safely
-                    created_at = booking.get('created_at')
-                    if created_at:
-                        try:
-                            if 'Z' in created_at:
-                                created_at = created_at.replace('Z', '+00:00')
-                            formatted_time = datetime.fromisoformat(created_at).strftime('%Y-%m-%d %H:%M')
-                        except:
-                            formatted_time = "Unknown"
-                    else:
-                        formatted_time = "Unknown"
+            if submit_button:
+                if not vehicle_number.strip():
+                    st.error("❌ Please enter your vehicle registration number")
+                elif not slot_id:
+                    st.error("❌ Please select a charging slot")
+                else:
+                    # Show loading spinner
+                    with st.spinner("Creating your booking..."):
+                        # Prepare booking data
+                        booking_data = {
+                            "slot_id": slot_id,
+                            "vehicle_number": vehicle_number.strip(),
+                            "vehicle_type": vehicle_type,
+                            "start_time": datetime.combine(start_date, start_clock).astimezone().isoformat()
+                        }
+                        
+                        # DEBUG: Show what's being sent
+                        with st.expander("🔧 Debug Information"):
+                            st.write("**Request Details:**")
+                            st.json({
+                                "endpoint": "/bookings",
+                                "method": "POST",
+                                "params": {"user_id": st.session_state.user_id},
+                                "data": booking_data
+                            })
+                        
+                        # Make the API request with user_id as query parameter
+                        result = make_api_request(
+                            "/bookings", 
+                            method="POST", 
+                            data=booking_data, 
+                            params={"user_id": st.session_state.user_id}
+                        )
+                        
+                        if result and result.get("success"):
+                            st.success("✅ Booking confirmed successfully!")
+                            st.balloons()
+                            st.info(f"Booking ID: {result.get('booking', {}).get('id', 'N/A')}")
+                            # Refresh the view to show updated slots
+                            rerun_view()
+                        else:
+                            error_msg = result.get('message', 'Unknown error') if result else 'No response from server'
+                            st.error(f"❌ Failed to create booking: {error_msg}")
+    
+    else:
+        st.info("📭 No available charging slots at the moment.")
+        st.write("Please check back later or contact administrator for more slots.")
+
+@fragment
+def user_bookings_view():
+    """Upcoming and past bookings of the current user"""
+    st.header("My Bookings")
+    
+    # Old finished bookings live in the archive and are only fetched on request
+    include_archive = st.checkbox("Include archived history", key="user_include_archive")
+    dashboard_data = make_api_request(f"/dashboard/user/{st.session_state.user_id}",
+                                      params={"include_archive": True} if include_archive else None)
+    if dashboard_data:
+        upcoming = dashboard_data.get("upcoming_bookings", [])
+        past = dashboard_data.get("past_bookings", [])
+        
+        st.subheader("Upcoming Bookings")
+        if upcoming:
+            for booking in upcoming:
+                formatted_time = format_timestamp(booking.get('created_at'))
+                
+                with st.expander(f"Booking {booking['id'][:8]} - {booking.get('vehicle_number', 'N/A')}"):
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        st.write(f"**Slot:** {booking.get('charging_slots', {}).get('location', 'N/A')} - Slot {booking.get('charging_slots', {}).get('slot_number', 'N/A')}")
+                        st.write(f"**Vehicle:** {booking.get('vehicle_number', 'N/A')} ({booking.get('vehicle_type', 'N/A')})")
+                    with col2:
+                        st.write(f"**Status:** {booking.get('booking_status', 'N/A')}")
+                        st.write(f"**Booked on:** {formatted_time}")
                     
-                    with st.expander(f"Booking {booking['id'][:8]} - {booking.get('vehicle_number', 'N/A')}"):
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.write(f"**Slot:** {booking.get('charging_slots', {}).get('location', 'N/A')} - Slot {booking.get('charging_slots', {}).get('slot_number', 'N/A')}")
-                            st.write(f"**Vehicle:** {booking.get('vehicle_number', 'N/A')} ({booking.get('vehicle_type', 'N/A')})")
-                        with col2:
-                            st.write(f"**Status:** {booking.get('booking_status', 'N/A')}")
-                            st.write(f"**Booked on:** {formatted_time}")
-            else:
-                st.info("No past bookings.")
+                    if booking.get('booking_status') == 'confirmed':
+                        if st.button("Cancel Booking", key=f"cancel_{booking['id']}"):
+                            result = make_api_request(f"/bookings/{booking['id']}/cancel", "PUT", params={"user_id": st.session_state.user_id})
+                            if result:
+                                st.success("Booking cancelled successfully!")
+                                rerun_view()
         else:
-            st.warning("Could not load booking data")
-    
-    with tab3:
-        st.header("Available Slots")
-        slots_data = make_api_request("/slots", params={"available_only": True})
-        available_slots = slots_data.get("slots", []) if slots_data else []
+            st.info("No upcoming bookings.")
         
-        if available_slots:
-            st.subheader(f"Found {len(available_slots)} available slot(s)")
-            for slot in available_slots:
-                col1, col2 = st.columns([3, 1])
-                with col1:
-                    st.write(f"**📍 {slot['location']} - Slot {slot['slot_number']}**")
-                with col2:
-                    st.success("✅ Available")
-                st.write("---")
+        st.subheader("Past Bookings")
+        if past:
+            for booking in past:
+                formatted_time = format_timestamp(booking.get('created_at'))
+                
+                with st.expander(f"Booking {booking['id'][:8]} - {booking.get('vehicle_number', 'N/A')}"):
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        st.write(f"**Slot:** {booking.get('charging_slots', {}).get('location', 'N/A')} - Slot {booking.get('charging_slots', {}).get('slot_number', 'N/A')}")
+                        st.write(f"**Vehicle:** {booking.get('vehicle_number', 'N/A')} ({booking.get('vehicle_type', 'N/A')})")
+                    with col2:
+                        st.write(f"**Status:** {booking.get('booking_status', 'N/A')}")
+                        st.write(f"**Booked on:** {formatted_time}")
         else:
-            st.info("No available slots at the moment.")
+            st.info("No past bookings.")
+    else:
+        st.warning("Could not load booking data")
+
+@fragment
+def user_available_slots_view():
+    """List of currently available slots"""
+    st.header("Available Slots")
+    slots_data = make_api_request("/slots", params={"available_only": True})
+    available_slots = slots_data.get("slots", []) if slots_data else []
     
-    with tab4:
-        st.header("Profile")
-        col1, col2 = st.columns(2)
-        with col1:
-            st.subheader("Account Information")
-            st.info(f"**Username:** {st.session_state.username}")
-            st.info(f"**Role:** {st.session_state.role}")
-            st.info(f"**User ID:** {st.session_state.user_id}")
+    if available_slots:
+        st.subheader(f"Found {len(available_slots)} available slot(s)")
+        for slot in available_slots:
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                st.write(f"**📍 {slot['location']} - Slot {slot['slot_number']}**")
+            with col2:
+                st.success("✅ Available")
+            st.write("---")
+    else:
+        st.info("No available slots at the moment.")
+
+def user_profile_view():
+    """Account information and actions"""
+    st.header("Profile")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("Account Information")
+        st.info(f"**Username:** {st.session_state.username}")
+        st.info(f"**Role:** {st.session_state.role}")
+        st.info(f"**User ID:** {st.session_state.user_id}")
+    
+    with col2:
+        st.subheader("Actions")
+        if st.button("🔄 Refresh Data", type="secondary"):
+            invalidate_api_cache()
+            st.rerun()
         
-        with col2:
-            st.subheader("Actions")
-            if st.button("🔄 Refresh Data", type="secondary"):
-                st.rerun()
-            
-            if st.button("🚪 Logout", type="primary"):
-                logout()
+        if st.button("🚪 Logout", type="primary"):
+            logout()
+
+USER_VIEWS = {
+    "Book Slot": user_book_slot_view,
+    "My Bookings": user_bookings_view,
+    "Available Slots": user_available_slots_view,
+    "Profile": user_profile_view,
+}
 
 def admin_dashboard():
     """Admin dashboard"""
@@ -346,134 +548,223 @@ def admin_dashboard():
     else:
         st.warning("Could not load admin dashboard data")
     
-    # Admin tabs
-    tab1, tab2, tab3, tab4 = st.tabs(["Manage Slots", "View Bookings", "Add New Slot", "Profile"])
+    # Only the selected view is rendered, so only its data is fetched
+    view = st.radio("View", list(ADMIN_VIEWS), horizontal=True, key="admin_view", label_visibility="collapsed")
+    render_view(view, ADMIN_VIEWS[view])
+
+ADMIN_PAGE_SIZES = [25, 50, 100, 200]
+
+def reset_page(key):
+    """on_change callback for a view's filters: a new result starts on its first page"""
+    st.session_state[f"{key}_page"] = 1
+
+def fetch_page(key, endpoint, params):
+    """Fetch the current page of a paginated view, moving to the last page if it is past the end"""
+    page_size = st.session_state.get(f"{key}_page_size", ADMIN_PAGE_SIZES[0])
+    page = st.session_state.get(f"{key}_page", 1)
+    data = make_api_request(endpoint, params={**params, "limit": page_size, "offset": (page - 1) * page_size})
+    last = max(1, -(-(data.get("total", 0) if data else 0) // page_size))
+    if page > last:
+        # e.g. rows deleted from the last page; clamped here so the table and page count agree
+        st.session_state[f"{key}_page"] = last
+        data = make_api_request(endpoint, params={**params, "limit": page_size, "offset": (last - 1) * page_size})
+    return data
+
+def pagination_controls(key, total):
+    """Page size and page number selectors; returns (limit, offset)"""
+    col1, col2, col3 = st.columns([1, 1, 2])
+    with col1:
+        page_size = st.selectbox("Rows per page", ADMIN_PAGE_SIZES, key=f"{key}_page_size",
+                                 on_change=reset_page, args=(key,))
+    pages = max(1, -(-total // page_size))
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        st.session_state[f"{key}_page"] = pages
+    with col2:
+        page = st.number_input("Page", min_value=1, max_value=pages, value=1, step=1, key=f"{key}_page")
+    with col3:
+        st.write("")
+        st.caption(f"{total} row(s), page {page} of {pages}")
+    return page_size, (page - 1) * page_size
+
+@fragment
+def admin_manage_slots_view():
+    """Paginated slot table with bulk delete"""
+    st.header("Manage Charging Slots")
     
-    with tab1:
-        st.header("Manage Charging Slots")
-        
-        slots_data = make_api_request("/slots")
-        slots = slots_data.get("slots", []) if slots_data else []
-        
-        if slots:
-            st.subheader(f"Total Slots: {len(slots)}")
-            for slot in slots:
-                col1, col2, col3, col4 = st.columns([3, 2, 2, 2])
-                with col1:
-                    st.write(f"**{slot['location']} - Slot {slot['slot_number']}**")
-                with col2:
-                    status = "Available" if slot['is_available'] else "Booked"
-                    color = "🟢" if slot['is_available'] else "🔴"
-                    st.write(f"{color} {status}")
-                with col3:
-                    slot_id_short = slot['id'][:8] + "..."
-                    st.write(f"ID: `{slot_id_short}`")
-                with col4:
-                    if st.button("Delete", key=f"delete_{slot['id']}", type="secondary"):
-                        result = make_api_request(f"/slots/{slot['id']}", "DELETE", params={"user_id": st.session_state.user_id})
-                        if result:
-                            st.success("Slot deleted successfully!")
-                            st.rerun()
-                st.write("---")
-        else:
-            st.info("No slots configured. Add your first slot in the 'Add New Slot' tab.")
+    col1, col2 = st.columns(2)
+    with col1:
+        location = st.text_input("Location", key="slots_filter_location", placeholder="All locations",
+                                 on_change=reset_page, args=("slots",))
+    with col2:
+        available_only = st.checkbox("Available only", key="slots_filter_available",
+                                     on_change=reset_page, args=("slots",))
     
-    with tab2:
-        st.header("All Bookings")
-        
-        bookings_data = make_api_request("/bookings", params={"user_id": st.session_state.user_id, "admin_view": True})
-        bookings = bookings_data.get("bookings", []) if bookings_data else []
-        
-        if bookings:
-            st.subheader(f"Total Bookings: {len(bookings)}")
-            for booking in bookings:
-                # Handle timestamp formatting safely
-                created_at = booking.get('created_at')
-                if created_at:
-                    try:
-                        if 'Z' in created_at:
-                            created_at = created_at.replace('Z', '+00:00')
-                        formatted_time = datetime.fromisoformat(created_at).strftime('%Y-%m-%d %H:%M')
-                    except:
-                        formatted_time = "Unknown"
-                else:
-                    formatted_time = "Unknown"
-                
-                with st.expander(f"Booking {booking['id'][:8]} - {booking.get('user', {}).get('username', 'N/A')}"):
-                    col1, col2, col3 = st.columns(3)
-                    with col1:
-                        st.write(f"**User:** {booking.get('user', {}).get('username', 'N/A')}")
-                        st.write(f"**Slot:** {booking.get('charging_slots', {}).get('location', 'N/A')} - Slot {booking.get('charging_slots', {}).get('slot_number', 'N/A')}")
-                    with col2:
-                        st.write(f"**Vehicle:** {booking.get('vehicle_number', 'N/A')}")
-                        st.write(f"**Type:** {booking.get('vehicle_type', 'N/A')}")
-                    with col3:
-                        status = booking.get('booking_status', 'N/A')
-                        status_color = "🟢" if status == 'confirmed' else "🟡" if status == 'completed' else "🔴"
-                        st.write(f"**Status:** {status_color} {status}")
-                        st.write(f"**Booked on:** {formatted_time}")
-                    
-                    if booking.get('booking_status') == 'confirmed':
-                        if st.button("Cancel Booking", key=f"admin_cancel_{booking['id']}"):
-                            result = make_api_request(f"/bookings/{booking['id']}/cancel", "PUT", params={"user_id": st.session_state.user_id})
-                            if result:
-                                st.success("Booking cancelled successfully!")
-                                st.rerun()
-        else:
-            st.info("No bookings found.")
+    params = {"location": location.strip() or None, "available_only": available_only}
+    slots_data = fetch_page("slots", "/slots", params)
+    slots = slots_data.get("slots", []) if slots_data else []
+    total = slots_data.get("total", 0) if slots_data else 0
     
-    with tab3:
-        st.header("Add New Slot")
+    if slots:
+        rows = [{
+            "Select": False,
+            "Location": slot['location'],
+            "Slot": slot['slot_number'],
+            "Status": "🟢 Available" if slot['is_available'] else "🔴 Booked",
+            "ID": slot['id'],
+        } for slot in slots]
+        edited = st.data_editor(rows, key="slots_table", hide_index=True, use_container_width=True,
+                                disabled=["Location", "Slot", "Status", "ID"])
+        selected = [row["ID"] for row in edited if row["Select"]]
         
-        with st.form("add_slot_form", clear_on_submit=True):
-            st.subheader("Create New Charging Slot")
-            col1, col2 = st.columns(2)
-            with col1:
-                location = st.text_input("Location", placeholder="e.g., Main Station, Downtown, Mall")
-            with col2:
-                slot_number = st.number_input("Slot Number", min_value=1, step=1, value=1)
+        if st.button(f"🗑️ Delete selected ({len(selected)})", disabled=not selected, type="secondary"):
+            result = make_api_request("/slots/bulk-delete", "POST", {"slot_ids": selected},
+                                      params={"user_id": st.session_state.user_id})
+            if result:
+                st.success(result.get("message", "Slots deleted successfully!"))
+                rerun_view()
+    else:
+        st.info("No slots found. Add your first slot in the 'Add New Slot' view.")
+    
+    pagination_controls("slots", total)
+
+@fragment
+def admin_bookings_view():
+    """Paginated booking table with filters and bulk cancel"""
+    st.header("All Bookings")
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        status = st.selectbox("Status", ["all", "confirmed", "completed", "cancelled"], key="bookings_filter_status",
+                              on_change=reset_page, args=("bookings",))
+    with col2:
+        location = st.text_input("Location", key="bookings_filter_location", placeholder="All locations",
+                                 on_change=reset_page, args=("bookings",))
+    with col3:
+        date_range = st.date_input("Booked between", value=(), key="bookings_filter_dates",
+                                   on_change=reset_page, args=("bookings",))
+    include_archive = st.checkbox("Include archived bookings", key="bookings_filter_archive",
+                                  on_change=reset_page, args=("bookings",))
+    
+    params = {
+        "user_id": st.session_state.user_id,
+        "admin_view": True,
+        "status": None if status == "all" else status,
+        "location": location.strip() or None,
+        "include_archive": True if include_archive else None,
+    }
+    if len(date_range) == 2:
+        params["date_from"] = date_range[0].isoformat()
+        params["date_to"] = f"{date_range[1].isoformat()}T23:59:59"
+    
+    params = {k: v for k, v in params.items() if v is not None}
+    bookings_data = fetch_page("bookings", "/bookings", params)
+    bookings = bookings_data.get("bookings", []) if bookings_data else []
+    total = bookings_data.get("total", 0) if bookings_data else 0
+    
+    if bookings:
+        rows = []
+        for booking in bookings:
+            formatted_time = format_timestamp(booking.get('created_at'))
             
-            if st.form_submit_button("➕ Add Slot", type="primary"):
-                if location.strip() and slot_number > 0:
-                    result = make_api_request("/slots", "POST", {
-                        "location": location.strip(),
-                        "slot_number": int(slot_number)
-                    }, params={"user_id": st.session_state.user_id})
-                    
-                    if result:
-                        st.success("Slot added successfully!")
-                        st.rerun()
-                    else:
-                        st.error("Failed to add slot. Please try again.")
-                else:
-                    st.error("Please fill all fields correctly")
+            slot = booking.get('charging_slots') or {}
+            rows.append({
+                "Select": False,
+                "User": (booking.get('users') or {}).get('username', 'N/A'),
+                "Slot": f"{slot.get('location', 'N/A')} - Slot {slot.get('slot_number', 'N/A')}",
+                "Vehicle": booking.get('vehicle_number', 'N/A'),
+                "Type": booking.get('vehicle_type', 'N/A'),
+                "Status": booking.get('booking_status', 'N/A'),
+                "Booked on": formatted_time,
+                "ID": booking['id'],
+            })
+        edited = st.data_editor(rows, key="bookings_table", hide_index=True, use_container_width=True,
+                                disabled=["User", "Slot", "Vehicle", "Type", "Status", "Booked on", "ID"])
+        selected = [row["ID"] for row in edited if row["Select"] and row["Status"] == "confirmed"]
+        
+        if st.button(f"Cancel selected ({len(selected)})", disabled=not selected):
+            result = make_api_request("/bookings/bulk-cancel", "POST", {"booking_ids": selected},
+                                      params={"user_id": st.session_state.user_id})
+            if result:
+                st.success(result.get("message", "Bookings cancelled successfully!"))
+                rerun_view()
+    else:
+        st.info("No bookings found.")
+    
+    pagination_controls("bookings", total)
+
+@fragment
+def admin_add_slot_view():
+    """Form to create a new slot"""
+    st.header("Add New Slot")
     
-    with tab4:
-        st.header("Admin Profile")
+    with st.form("add_slot_form", clear_on_submit=True):
+        st.subheader("Create New Charging Slot")
         col1, col2 = st.columns(2)
         with col1:
-            st.subheader("Account Information")
-            st.success(f"**Username:** {st.session_state.username}")
-            st.success(f"**Role:** {st.session_state.role}")
-            st.success(f"**User ID:** {st.session_state.user_id}")
-        
+            location = st.text_input("Location", placeholder="e.g., Main Station, Downtown, Mall")
+            latitude = st.text_input("Latitude (optional)", placeholder="e.g., 17.38500")
         with col2:
-            st.subheader("Administrative Actions")
-            if st.button("🔄 Refresh All Data", type="secondary"):
-                st.rerun()
-            
-            if st.button("📊 System Status", type="secondary"):
-                # Quick system status check
-                slots_data = make_api_request("/slots")
-                bookings_data = make_api_request("/bookings", params={"user_id": st.session_state.user_id, "admin_view": True})
+            slot_number = st.number_input("Slot Number", min_value=1, step=1, value=1)
+            longitude = st.text_input("Longitude (optional)", placeholder="e.g., 78.48670")
+        
+        if st.form_submit_button("➕ Add Slot", type="primary"):
+            try:
+                coordinates = [float(v) if v.strip() else None for v in (latitude, longitude)]
+            except ValueError:
+                coordinates = None
+            if coordinates is None or coordinates.count(None) == 1:
+                st.error("Please enter both latitude and longitude as numbers, or leave both empty")
+            elif location.strip() and slot_number > 0:
+                result = make_api_request("/slots", "POST", {
+                    "location": location.strip(),
+                    "slot_number": int(slot_number),
+                    "latitude": coordinates[0],
+                    "longitude": coordinates[1]
+                }, params={"user_id": st.session_state.user_id})
                 
-                if slots_data and bookings_data:
-                    st.info(f"System Status: ✅ Operational")
-                    st.info(f"Total Slots: {len(slots_data.get('slots', []))}")
-                    st.info(f"Total Bookings: {len(bookings_data.get('bookings', []))}")
+                if result:
+                    st.success("Slot added successfully!")
+                    rerun_view()
+                else:
+                    st.error("Failed to add slot. Please try again.")
+            else:
+                st.error("Please fill all fields correctly")
+
+def admin_profile_view():
+    """Admin account information and actions"""
+    st.header("Admin Profile")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("Account Information")
+        st.success(f"**Username:** {st.session_state.username}")
+        st.success(f"**Role:** {st.session_state.role}")
+        st.success(f"**User ID:** {st.session_state.user_id}")
+    
+    with col2:
+        st.subheader("Administrative Actions")
+        if st.button("🔄 Refresh All Data", type="secondary"):
+            invalidate_api_cache()
+            st.rerun()
+        
+        if st.button("📊 System Status", type="secondary"):
+            # Quick system status check
+            slots_data = make_api_request("/slots")
+            bookings_data = make_api_request("/bookings", params={"user_id": st.session_state.user_id, "admin_view": True})
             
-            if st.button("🚪 Logout", type="primary"):
-                logout()
+            if slots_data and bookings_data:
+                st.info(f"System Status: ✅ Operational")
+                st.info(f"Total Slots: {len(slots_data.get('slots', []))}")
+                st.info(f"Total Bookings: {len(bookings_data.get('bookings', []))}")
+        
+        if st.button("🚪 Logout", type="primary"):
+            logout()
+
+ADMIN_VIEWS = {
+    "Manage Slots": admin_manage_slots_view,
+    "View Bookings": admin_bookings_view,
+    "Add New Slot": admin_add_slot_view,
+    "Profile": admin_profile_view,
+}
 
 def login_page():
     """Login/Registration page"""
@@ -531,7 +822,18 @@ def login_page():
 
 def main():
     """Main application logic"""
-    
+    st.session_state.run_requests = {}
+    st.session_state.perf_run = new_perf_run()
+    st.session_state.full_run = True
+    try:
+        render_page()
+    finally:
+        st.session_state.full_run = False
+        finish_perf_run()
+    perf_panel()
+
+def render_page():
+    """Render the page for the current login state"""
     # Check if backend is running
     if not check_api_health():
         st.error("⚠️ Backend API is not running. Please start the FastAPI server first.")
@@ -0,0 +1,23 @@
+-- Booking start times and the notification outbox
+alter table bookings add column if not exists start_time timestamptz;
+
+create table if not exists notification_outbox (
+    id uuid primary key default gen_random_uuid(),
+    kind text not null,
+    booking_id uuid,
+    user_id uuid,
+    payload jsonb not null default '{}'::jsonb,
+    dedupe_key text not null unique,
+    status text not null default 'pending',
+    attempts integer not null default 0,
+    next_attempt_at timestamptz not null default now(),
+    last_error text,
+    created_at timestamptz not null default now(),
+    sent_at timestamptz
+);
+
+create index if not exists notification_outbox_due_idx
+    on notification_outbox (status, next_attempt_at, created_at);
+
+create index if not exists bookings_status_start_time_idx
+    on bookings (booking_status, start_time);
@@ -0,0 +1,3 @@
+-- Charger coordinates for the nearest-available-slot search
+alter table charging_slots add column if not exists latitude double precision;
+alter table charging_slots add column if not exists longitude double precision;
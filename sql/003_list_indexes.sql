@@ -0,0 +1,22 @@
+-- Indexes backing the filter/sort fields accepted by GET /slots and GET /bookings
+-- (see src/filters.py). Every query ends with an "id" tie-breaker for stable paging.
+
+create index if not exists bookings_user_status_created_idx
+    on bookings (user_id, booking_status, created_at desc);
+create index if not exists bookings_status_created_idx
+    on bookings (booking_status, created_at desc);
+create index if not exists bookings_slot_status_idx
+    on bookings (slot_id, booking_status);
+create index if not exists bookings_created_idx
+    on bookings (created_at desc, id);
+create index if not exists bookings_vehicle_type_created_idx
+    on bookings (vehicle_type, created_at desc);
+create index if not exists bookings_start_time_idx
+    on bookings (start_time, id);
+
+create index if not exists charging_slots_location_number_idx
+    on charging_slots (location, slot_number);
+create index if not exists charging_slots_available_location_idx
+    on charging_slots (is_available, location, slot_number);
+create index if not exists charging_slots_created_idx
+    on charging_slots (created_at);
@@ -0,0 +1,30 @@
+-- Cold store for cancelled and completed bookings past the retention window
+-- (BOOKING_ARCHIVE_DAYS). Rows keep a snapshot of their user and slot instead of
+-- foreign keys, so slots and users can change or go away without touching history.
+create table if not exists bookings_archive (
+    id uuid primary key,
+    user_id uuid,
+    slot_id uuid,
+    vehicle_number text,
+    vehicle_type text,
+    booking_status text not null,
+    start_time timestamptz,
+    created_at timestamptz,
+    cancelled_at timestamptz,
+    username text,
+    location text,
+    slot_number integer,
+    archived_at timestamptz not null default now()
+);
+
+create index if not exists bookings_archive_user_created_idx
+    on bookings_archive (user_id, created_at desc);
+create index if not exists bookings_archive_created_idx
+    on bookings_archive (created_at desc, id);
+create index if not exists bookings_archive_location_created_idx
+    on bookings_archive (location, created_at desc);
+create index if not exists bookings_archive_status_created_idx
+    on bookings_archive (booking_status, created_at desc);
+
+-- The archival job scans finished bookings by age; covered by
+-- bookings_status_created_idx from 003_list_indexes.sql.
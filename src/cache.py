@@ -0,0 +1,215 @@
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .coherence import VersionCounters
+from .singleflight import SingleFlight
+
+# Per-request read cache, shared by everything running inside one request_scope()
+_request_cache: contextvars.ContextVar[Optional[Dict[Any, Any]]] = contextvars.ContextVar("request_cache", default=None)
+
+@contextmanager
+def request_scope():
+    """Share Database reads between all calls made inside this block"""
+    token = _request_cache.set({})
+    try:
+        yield
+    finally:
+        _request_cache.reset(token)
+
+class ReadCache:
+    """Process-wide TTL cache whose entries are tagged with the namespace version they were read at
+    
+    An entry is served only while its namespace version is unchanged, so a write in
+    any worker invalidates it immediately; the TTL bounds staleness for changes made
+    outside this API.
+    """
+    
+    def __init__(self, ttl: float, versions_path: str = None):
+        self.ttl = ttl
+        self.versions_path = versions_path
+        self._versions: Optional[VersionCounters] = None
+        self._entries: Dict[Any, Tuple[float, int, Any]] = {}
+        self._lock = threading.Lock()
+    
+    @property
+    def versions(self) -> VersionCounters:
+        if self._versions is None:
+            with self._lock:
+                if self._versions is None:
+                    self._versions = VersionCounters(self.versions_path)
+        return self._versions
+    
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+    
+    def get(self, key: Any) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires, version, value = entry
+        if expires < time.monotonic() or version != self.versions.get(key[0]):
+            self._entries.pop(key, None)
+            return False, None
+        return True, value
+    
+    def put(self, key: Any, version: int, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, version, value)
+    
+    def invalidate(self, *namespaces: str) -> None:
+        """Bump namespace versions, dropping matching entries in every worker"""
+        self.versions.bump(*namespaces)
+    
+    def purge_expired(self) -> int:
+        """Remove expired or superseded entries; returns how many were dropped"""
+        now = time.monotonic()
+        stale = [key for key, (expires, version, _) in list(self._entries.items())
+                 if expires < now or version != self.versions.get(key[0])]
+        for key in stale:
+            self._entries.pop(key, None)
+        return len(stale)
+
+read_cache = ReadCache(
+    ttl=float(os.getenv("API_CACHE_TTL", "5")),
+    versions_path=os.getenv("API_CACHE_VERSIONS_FILE"),
+)
+
+# Identical concurrent reads share one upstream call, whether or not caching is enabled
+single_flight = SingleFlight()
+
+def invalidate(*namespaces: str) -> None:
+    """Drop cached entries of the given namespaces, request-scoped and process-wide"""
+    cache = _request_cache.get()
+    if cache:
+        for key in [k for k in list(cache) if k[0] in namespaces]:
+            cache.pop(key, None)
+    read_cache.invalidate(*namespaces)
+
+def namespace_versions(*namespaces: str) -> Tuple[int, ...]:
+    """Current versions of the given namespaces, for validating derived data across workers"""
+    return tuple(read_cache.versions.get(name) for name in namespaces)
+
+# Set by a Database read that swallowed an upstream error and returned its fallback
+_read_failed: contextvars.ContextVar[bool] = contextvars.ContextVar("read_failed", default=False)
+
+def read_failed() -> None:
+    """Mark the current read as failed, so its fallback result is never cached"""
+    _read_failed.set(True)
+
+def checked_read(method: Callable, *args, **kwargs) -> Tuple[Any, bool]:
+    """Call a Database read; also returns False when it fell back after an upstream error"""
+    token = _read_failed.set(False)
+    try:
+        result = method(*args, **kwargs)
+        return result, not _read_failed.get()
+    finally:
+        _read_failed.reset(token)
+
+def cached_read(namespace: str) -> Callable:
+    """Decorate a Database read to serve it from the request-scoped and process-wide caches
+    
+    Misses go through single_flight, so identical concurrent reads share one upstream
+    call even when the process cache is disabled. Coroutines can await the same read
+    with read_async(). Reads that called read_failed() are shared with the callers
+    already waiting on them but never cached.
+    """
+    def decorator(method: Callable) -> Callable:
+        name = f"{namespace}.{method.__name__}"
+        
+        def lookup(key) -> Tuple[bool, Any]:
+            cache = _request_cache.get()
+            if cache is not None and key in cache:
+                return True, cache[key]
+            if read_cache.enabled:
+                return read_cache.get(key)
+            return False, None
+        
+        def remember(key, version: int, result: Any) -> None:
+            if read_cache.enabled and version is not None:
+                read_cache.put(key, version, result)
+            cache = _request_cache.get()
+            if cache is not None:
+                cache[key] = result
+        
+        def call(self, args, kwargs) -> Tuple[Any, bool]:
+            token = _read_failed.set(False)
+            try:
+                result = method(self, *args, **kwargs)
+                return result, _read_failed.get()
+            finally:
+                _read_failed.reset(token)
+        
+        def settle(key, version: int, flight: Tuple[Any, bool]) -> Any:
+            result, failed = flight
+            if failed:
+                # Let an enclosing cached read know it is built on a failure too
+                read_failed()
+            else:
+                remember(key, version, result)
+            return result
+        
+        def make_key(self, args, kwargs):
+            key = (namespace, getattr(self, "cache_scope", None), method.__name__, args, tuple(sorted(kwargs.items())))
+            try:
+                hash(key)
+            except TypeError:
+                # Unhashable arguments (e.g. lists of ids) are never cached or coalesced
+                return None
+            return key
+        
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            key = make_key(self, args, kwargs)
+            if key is None:
+                return method(self, *args, **kwargs)
+            hit, result = lookup(key)
+            if hit:
+                remember(key, None, result)
+                return result
+            # Read the version first so a concurrent write leaves this entry stale and
+            # callers arriving after the write start a fresh flight
+            version = read_cache.versions.get(namespace)
+            return settle(key, version, single_flight.do(key + (version,), name, lambda: call(self, args, kwargs)))
+        
+        async def read_async(self, *args, **kwargs):
+            key = make_key(self, args, kwargs)
+            if key is None:
+                return await asyncio.get_running_loop().run_in_executor(None, functools.partial(method, self, *args, **kwargs))
+            hit, result = lookup(key)
+            if hit:
+                remember(key, None, result)
+                return result
+            version = read_cache.versions.get(namespace)
+            return settle(key, version, await single_flight.do_async(key + (version,), name, lambda: call(self, args, kwargs)))
+        
+        wrapper.read_async = read_async
+        return wrapper
+    return decorator
+
+async def read_async(method: Callable, *args, **kwargs) -> Any:
+    """Await a Database read from a coroutine without tying up a worker thread while it waits
+    
+    e.g. `slots = await read_async(db.get_available_slots)`
+    """
+    coalesced = getattr(getattr(method, "__func__", None), "read_async", None)
+    if coalesced is None:
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(method, *args, **kwargs))
+    return await coalesced(method.__self__, *args, **kwargs)
+
+def invalidates(*namespaces: str) -> Callable:
+    """Decorate a Database write so it drops cached reads of the namespaces it changes"""
+    def decorator(method: Callable) -> Callable:
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                invalidate(*namespaces)
+        return wrapper
+    return decorator
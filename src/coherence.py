@@ -0,0 +1,45 @@
+import mmap
+import os
+import struct
+import tempfile
+from typing import Dict, Iterable
+
+from . import filelock
+
+NAMESPACES = ("users", "slots", "bookings")
+DEFAULT_PATH = os.path.join(tempfile.gettempdir(), "ev_booking_cache_versions")
+
+_COUNTER = struct.Struct("<Q")
+
+class VersionCounters:
+    """Per-namespace version counters shared by every process that maps the same file
+    
+    A write bumps the counters of the namespaces it touches; readers compare the
+    counter against the version their cached entry was built at. Reading a counter
+    is a plain load from shared memory, so every worker sees a write in another
+    worker as soon as the bump lands, with no external service involved.
+    """
+    
+    def __init__(self, path: str = None, namespaces: Iterable[str] = NAMESPACES):
+        self.path = path or DEFAULT_PATH
+        self.slots: Dict[str, int] = {name: i * _COUNTER.size for i, name in enumerate(namespaces)}
+        size = _COUNTER.size * len(self.slots)
+        
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+    
+    def get(self, namespace: str) -> int:
+        """Current version of a namespace"""
+        return _COUNTER.unpack_from(self._map, self.slots[namespace])[0]
+    
+    def bump(self, *namespaces: str) -> None:
+        """Advance the versions of the given namespaces in every process"""
+        filelock.lock(self._fd)
+        try:
+            for name in namespaces:
+                offset = self.slots[name]
+                _COUNTER.pack_into(self._map, offset, _COUNTER.unpack_from(self._map, offset)[0] + 1)
+        finally:
+            filelock.unlock(self._fd)
@@ -1,96 +1,236 @@
 import os
+import time
 from supabase import create_client, Client
 from dotenv import load_dotenv
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Callable, Tuple
+from .cache import cached_read, invalidates, read_failed
+from .models import User, Slot, Booking, bookings_from_rows
+from .filters import Filters, Sort, apply_query, merge_page
+from .localdb import LocalClient
 
 load_dotenv()
 
+FINISHED = ("cancelled", "completed")
+
+# How often a backend missing an optional migration is checked for it again
+FEATURE_RECHECK_SECONDS = 300
+
+# Schema added by the migrations in sql/: feature -> (table, column probed, migration)
+FEATURES = {
+    "start_time": ("bookings", "start_time", "sql/001_notification_outbox.sql"),
+    "outbox": ("notification_outbox", "id", "sql/001_notification_outbox.sql"),
+    "archive": ("bookings_archive", "id", "sql/004_bookings_archive.sql"),
+}
+
+# Archived bookings keep a snapshot of their slot and user instead of foreign keys,
+# so filters on the embedded slot map onto plain archive columns
+ARCHIVE_COLUMNS = {"charging_slots.location": "location"}
+
+def _archive_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten a booking row with its users/charging_slots embeds for bookings_archive"""
+    slot = row.get("charging_slots") or {}
+    return {
+        "id": row["id"],
+        "user_id": row.get("user_id"),
+        "slot_id": row.get("slot_id"),
+        "vehicle_number": row.get("vehicle_number"),
+        "vehicle_type": row.get("vehicle_type"),
+        "booking_status": row.get("booking_status"),
+        "start_time": row.get("start_time"),
+        "created_at": row.get("created_at"),
+        "cancelled_at": row.get("cancelled_at"),
+        "username": (row.get("users") or {}).get("username"),
+        "location": slot.get("location"),
+        "slot_number": slot.get("slot_number"),
+    }
+
+def _drop_archived_duplicates(hot: List[Booking], archived: List[Booking]) -> List[Booking]:
+    """Archived bookings not also in hot
+    
+    Archiving copies a batch before deleting it, so until the delete lands (or after it
+    failed) a booking is in both tables; the hot row is the one kept.
+    """
+    hot_ids = {booking.id for booking in hot}
+    return [booking for booking in archived if booking.id not in hot_ids]
+
+def _archived_bookings(rows: List[Dict[str, Any]]) -> List[Booking]:
+    """Booking records for archive rows, with the snapshot rebuilt into the usual embeds"""
+    return bookings_from_rows([dict(row, users={"username": row.get("username")}, charging_slots={
+        "id": row.get("slot_id"), "location": row.get("location"), "slot_number": row.get("slot_number"),
+        "is_available": None}) for row in rows])
+
 class Database:
-    def __init__(self):
-        self.url = os.getenv("SUPABASE_URL")
-        self.key = os.getenv("SUPABASE_KEY")
+    # Change listeners shared by all instances, called as listener(event, data) after each write
+    listeners: List[Callable[[str, Dict[str, Any]], None]] = []
+    
+    @classmethod
+    def subscribe(cls, listener: Callable[[str, Dict[str, Any]], None]) -> None:
+        cls.listeners.append(listener)
+    
+    def _emit(self, event: str, **data: Any) -> None:
+        for listener in self.listeners:
+            try:
+                listener(event, data)
+            except Exception as e:
+                print(f"Error in {event} listener: {e}")
+    
+    def __init__(self, url: str = None, key: str = None):
+        self.url = url or os.getenv("SUPABASE_URL")
+        self.key = key or os.getenv("SUPABASE_KEY")
+        # Cached reads are kept apart per backend when several are in use
+        self.cache_scope = self.url
+        # feature -> (present, when it was checked)
+        self._features: Dict[str, Tuple[bool, float]] = {}
+        if self.url and self.url.startswith("memory://"):
+            # In-process stand-in backend for local development and shard testing
+            self.client = LocalClient.connect(self.url)
+            return
         if not self.url or not self.key:
             raise ValueError("Supabase URL and KEY must be set in environment variables")
         self.client: Client = create_client(self.url, self.key)
     
     # User operations
-    def create_user(self, username: str, password: str, role: str = "user") -> Dict[str, Any]:
+    @invalidates("users")
+    def create_user(self, username: str, password: str, role: str = "user") -> Optional[User]:
         try:
             response = self.client.table("users").insert({
                 "username": username,
                 "password": password,
                 "role": role
             }).execute()
-            return response.data[0] if response.data else None
+            return User.from_row(response.data[0]) if response.data else None
         except Exception as e:
             print(f"Error creating user: {e}")
             return None
     
-    def get_user_by_username(self, username: str) -> Dict[str, Any]:
+    @cached_read("users")
+    def get_user_by_username(self, username: str) -> Optional[User]:
         try:
             response = self.client.table("users").select("*").eq("username", username).execute()
-            return response.data[0] if response.data else None
+            return User.from_row(response.data[0]) if response.data else None
         except Exception as e:
             print(f"Error getting user: {e}")
+            read_failed()
             return None
     
-    def get_user_by_id(self, user_id: str) -> Dict[str, Any]:
+    @cached_read("users")
+    def get_user_by_id(self, user_id: str) -> Optional[User]:
         try:
             response = self.client.table("users").select("*").eq("id", user_id).execute()
-            return response.data[0] if response.data else None
+            return User.from_row(response.data[0]) if response.data else None
         except Exception as e:
             print(f"Error getting user: {e}")
+            read_failed()
             return None
     
     # Charging slot operations
-    def create_charging_slot(self, location: str, slot_number: int) -> Dict[str, Any]:
+    @invalidates("slots", "bookings")
+    def create_charging_slot(self, location: str, slot_number: int, latitude: float = None,
+                             longitude: float = None) -> Optional[Slot]:
         try:
-            response = self.client.table("charging_slots").insert({
+            slot = {
                 "location": location,
                 "slot_number": slot_number,
                 "is_available": True
-            }).execute()
-            return response.data[0] if response.data else None
+            }
+            # Coordinates only exist once sql/002 is applied, so they are sent only when set
+            if latitude is not None:
+                slot["latitude"] = latitude
+            if longitude is not None:
+                slot["longitude"] = longitude
+            response = self.client.table("charging_slots").insert(slot).execute()
+            if not response.data:
+                return None
+            slot = Slot.from_row(response.data[0])
+            self._emit("slot_created", slot=slot)
+            return slot
         except Exception as e:
             print(f"Error creating charging slot: {e}")
             return None
     
-    def get_all_slots(self) -> List[Dict[str, Any]]:
+    @cached_read("slots")
+    def get_slot_by_id(self, slot_id: str) -> Optional[Slot]:
+        try:
+            response = self.client.table("charging_slots").select("*").eq("id", slot_id).execute()
+            return Slot.from_row(response.data[0]) if response.data else None
+        except Exception as e:
+            print(f"Error getting slot: {e}")
+            read_failed()
+            return None
+    
+    @cached_read("slots")
+    def get_all_slots(self) -> List[Slot]:
         try:
             response = self.client.table("charging_slots").select("*").execute()
-            return response.data
+            return [Slot.from_row(row) for row in response.data]
         except Exception as e:
             print(f"Error getting slots: {e}")
+            read_failed()
             return []
     
-    def get_available_slots(self) -> List[Dict[str, Any]]:
+    @cached_read("slots")
+    def get_available_slots(self) -> List[Slot]:
         try:
             response = self.client.table("charging_slots").select("*").eq("is_available", True).execute()
-            return response.data
+            return [Slot.from_row(row) for row in response.data]
         except Exception as e:
             print(f"Error getting available slots: {e}")
+            read_failed()
             return []
     
+    @cached_read("slots")
+    def list_slots(self, filters: Filters = (), sort: Sort = (), limit: int = None,
+                   offset: int = 0) -> Dict[str, Any]:
+        """Slots matching parsed filters (see src/filters.py), filtered and sorted upstream"""
+        try:
+            query = self.client.table("charging_slots").select("*", count="exact" if limit else None)
+            query = apply_query(query, filters, sort or (("location", False), ("slot_number", False)))
+            if limit:
+                query = query.range(offset, offset + limit - 1)
+            response = query.execute()
+            slots = [Slot.from_row(row) for row in response.data]
+            return {"slots": slots, "total": response.count if limit else len(slots)}
+        except Exception as e:
+            print(f"Error listing slots: {e}")
+            read_failed()
+            return {"slots": [], "total": 0}
+    
+    @invalidates("slots", "bookings")
     def update_slot_availability(self, slot_id: str, is_available: bool) -> bool:
         try:
             response = self.client.table("charging_slots").update({
                 "is_available": is_available
             }).eq("id", slot_id).execute()
+            self._emit("slot_availability", slot_ids=[slot_id], is_available=is_available)
             return True
         except Exception as e:
             print(f"Error updating slot: {e}")
             return False
     
+    @invalidates("slots", "bookings")
     def delete_slot(self, slot_id: str) -> bool:
         try:
             response = self.client.table("charging_slots").delete().eq("id", slot_id).execute()
+            self._emit("slot_deleted", slot_ids=[slot_id])
             return True
         except Exception as e:
             print(f"Error deleting slot: {e}")
             return False
     
+    @invalidates("slots", "bookings")
+    def delete_slots(self, slot_ids: List[str]) -> bool:
+        try:
+            response = self.client.table("charging_slots").delete().in_("id", slot_ids).execute()
+            self._emit("slot_deleted", slot_ids=slot_ids)
+            return True
+        except Exception as e:
+            print(f"Error deleting slots: {e}")
+            return False
+    
     # Booking operations
-    def create_booking(self, user_id: str, slot_id: str, vehicle_number: str, vehicle_type: str = None) -> Dict[str, Any]:
+    @invalidates("bookings", "slots")
+    def create_booking(self, user_id: str, slot_id: str, vehicle_number: str, vehicle_type: str = None,
+                       start_time: str = None) -> Optional[Booking]:
         try:
             # First, check if slot is available
             slot = self.client.table("charging_slots").select("*").eq("id", slot_id).execute()
@@ -98,39 +238,142 @@ class Database:
                 return None
             
             # Create booking
-            response = self.client.table("bookings").insert({
+            booking = {
                 "user_id": user_id,
                 "slot_id": slot_id,
                 "vehicle_number": vehicle_number,
                 "vehicle_type": vehicle_type,
                 "booking_status": "confirmed"
-            }).execute()
+            }
+            # start_time only exists once sql/001 is applied, so it is sent only when set
+            if start_time is not None:
+                booking["start_time"] = start_time
+            response = self.client.table("bookings").insert(booking).execute()
             
             # Mark slot as unavailable
             if response.data:
+                self._emit("booking_created", booking_id=response.data[0]["id"], user_id=user_id, slot_id=slot_id)
                 self.update_slot_availability(slot_id, False)
+                self.enqueue_booking_notifications("booking_confirmed", response.data, {slot_id: slot.data[0]})
             
-            return response.data[0] if response.data else None
+            return Booking.from_row(response.data[0]) if response.data else None
         except Exception as e:
             print(f"Error creating booking: {e}")
             return None
     
-    def get_user_bookings(self, user_id: str) -> List[Dict[str, Any]]:
+    @cached_read("bookings")
+    def get_user_bookings(self, user_id: str, include_archive: bool = False) -> List[Booking]:
         try:
             response = self.client.table("bookings").select("*, charging_slots(*)").eq("user_id", user_id).execute()
-            return response.data
+            bookings = bookings_from_rows(response.data)
+            if include_archive:
+                archived = self.list_archived_bookings((("user_id", "eq", user_id),))["bookings"]
+                bookings += _drop_archived_duplicates(bookings, archived)
+            return bookings
         except Exception as e:
             print(f"Error getting user bookings: {e}")
+            read_failed()
             return []
     
-    def get_all_bookings(self) -> List[Dict[str, Any]]:
+    @cached_read("bookings")
+    def get_all_bookings(self, include_archive: bool = False) -> List[Booking]:
         try:
             response = self.client.table("bookings").select("*, users(username), charging_slots(*)").execute()
-            return response.data
+            bookings = bookings_from_rows(response.data)
+            if include_archive:
+                bookings += _drop_archived_duplicates(bookings, self.list_archived_bookings()["bookings"])
+            return bookings
         except Exception as e:
             print(f"Error getting all bookings: {e}")
+            read_failed()
             return []
     
+    @cached_read("bookings")
+    def list_bookings(self, filters: Filters = (), sort: Sort = (), limit: int = None,
+                      offset: int = 0, include_archive: bool = False) -> Dict[str, Any]:
+        """Bookings matching parsed filters (see src/filters.py), filtered and sorted upstream
+        
+        With include_archive the archive is queried too and both result sets merged.
+        """
+        if include_archive:
+            # Each side returns its first offset + limit rows; the merged page is cut from those
+            window = offset + limit if limit else None
+            hot = self.list_bookings(filters, sort, window, 0)
+            archived = self.list_archived_bookings(filters, sort, window, 0)
+            archived_only = _drop_archived_duplicates(hot["bookings"], archived["bookings"])
+            # Overlap only exists for batches mid-archival, which sort together, so the
+            # overlap seen within the fetched windows is what the totals double count
+            overlap = len(archived["bookings"]) - len(archived_only)
+            bookings = merge_page(hot["bookings"] + archived_only, sort or (("created_at", True),), offset, limit)
+            total = hot["total"] + archived["total"] - overlap
+            return {"bookings": bookings, "total": total if limit else len(bookings)}
+        try:
+            # Filtering on the embedded slot requires an inner join
+            inner = any(column.startswith("charging_slots.") for column, _, _ in filters)
+            slots_embed = "charging_slots!inner(*)" if inner else "charging_slots(*)"
+            query = self.client.table("bookings").select(f"*, users(username), {slots_embed}",
+                                                         count="exact" if limit else None)
+            query = apply_query(query, filters, sort or (("created_at", True),))
+            if limit:
+                query = query.range(offset, offset + limit - 1)
+            response = query.execute()
+            bookings = bookings_from_rows(response.data)
+            return {"bookings": bookings, "total": response.count if limit else len(bookings)}
+        except Exception as e:
+            print(f"Error listing bookings: {e}")
+            read_failed()
+            return {"bookings": [], "total": 0}
+    
+    def has_feature(self, name: str) -> bool:
+        """Whether the schema behind an optional feature (see FEATURES) has been migrated"""
+        now = time.monotonic()
+        known = self._features.get(name)
+        if known is None or (not known[0] and now - known[1] > FEATURE_RECHECK_SECONDS):
+            table, column, migration = FEATURES[name]
+            try:
+                self.client.table(table).select(column).limit(1).execute()
+                present = True
+            except Exception:
+                present = False
+                print(f"{table}.{column} is missing, {name} features are off until {migration} is applied")
+            known = self._features[name] = (present, now)
+        return known[0]
+    
+    def has_archive(self) -> bool:
+        """Whether bookings_archive exists; archival is optional until sql/004 is applied"""
+        return self.has_feature("archive")
+    
+    @cached_read("bookings")
+    def list_archived_bookings(self, filters: Filters = (), sort: Sort = (), limit: int = None,
+                               offset: int = 0) -> Dict[str, Any]:
+        """Archived bookings matching parsed filters, in the same shape as list_bookings"""
+        if not self.has_archive():
+            return {"bookings": [], "total": 0}
+        try:
+            filters = tuple((ARCHIVE_COLUMNS.get(column, column), op, value) for column, op, value in filters)
+            query = self.client.table("bookings_archive").select("*", count="exact" if limit else None)
+            query = apply_query(query, filters, sort or (("created_at", True),))
+            if limit:
+                query = query.range(offset, offset + limit - 1)
+            response = query.execute()
+            bookings = _archived_bookings(response.data)
+            return {"bookings": bookings, "total": response.count if limit else len(bookings)}
+        except Exception as e:
+            print(f"Error listing archived bookings: {e}")
+            read_failed()
+            return {"bookings": [], "total": 0}
+    
+    @cached_read("bookings")
+    def get_active_bookings_for_slots(self, slot_ids: List[str]) -> List[Booking]:
+        try:
+            response = self.client.table("bookings").select("id, slot_id").in_("slot_id", slot_ids).eq("booking_status", "confirmed").execute()
+            return bookings_from_rows(response.data)
+        except Exception as e:
+            print(f"Error getting active bookings for slots: {e}")
+            read_failed()
+            return []
+    
+    @invalidates("bookings", "slots")
     def update_booking_status(self, booking_id: str, status: str) -> bool:
         try:
             update_data = {"booking_status": status}
@@ -138,6 +381,9 @@ class Database:
                 update_data["cancelled_at"] = "now()"
             
             response = self.client.table("bookings").update(update_data).eq("id", booking_id).execute()
+            if response.data:
+                self._emit("booking_status", booking_ids=[booking_id], status=status)
+                self.enqueue_booking_notifications(f"booking_{status}", response.data)
             
             # If cancelled, make slot available again
             if status == "cancelled":
@@ -150,10 +396,263 @@ class Database:
             print(f"Error updating booking: {e}")
             return False
     
-    def get_booking_by_id(self, booking_id: str) -> Dict[str, Any]:
+    @invalidates("bookings", "slots")
+    def cancel_bookings(self, booking_ids: List[str]) -> List[Booking]:
+        """Cancel the confirmed bookings among booking_ids and free their slots"""
+        try:
+            response = self.client.table("bookings").update({
+                "booking_status": "cancelled",
+                "cancelled_at": "now()"
+            }).in_("id", booking_ids).eq("booking_status", "confirmed").execute()
+            
+            slot_ids = list({b["slot_id"] for b in response.data})
+            if slot_ids:
+                self._emit("booking_status", booking_ids=[b["id"] for b in response.data], status="cancelled")
+                freed = self.client.table("charging_slots").update({"is_available": True}).in_("id", slot_ids).execute()
+                self._emit("slot_availability", slot_ids=slot_ids, is_available=True)
+                self.enqueue_booking_notifications("booking_cancelled", response.data, {row["id"]: row for row in freed.data})
+            
+            return bookings_from_rows(response.data)
+        except Exception as e:
+            print(f"Error cancelling bookings: {e}")
+            return []
+    
+    @invalidates("bookings", "slots")
+    def complete_bookings_before(self, cutoff: str, batch_size: int = 500) -> int:
+        """Mark confirmed bookings that started before cutoff as completed and free their slots, in batches
+        
+        A booking without a start time counts as starting when it was made, i.e. the
+        cutoff is compared against coalesce(start_time, created_at). Before sql/001 adds
+        start_time, every booking is compared by created_at.
+        """
+        if self.has_feature("start_time"):
+            # Two passes, since PostgREST filters cannot express coalesce() directly
+            due_filters = (
+                lambda query: query.lt("start_time", cutoff),
+                lambda query: query.is_("start_time", "null").lt("created_at", cutoff),
+            )
+        else:
+            due_filters = (lambda query: query.lt("created_at", cutoff),)
+        completed = 0
+        try:
+            for due in due_filters:
+                completed += self._complete_due(due, batch_size)
+            return completed
+        except Exception as e:
+            print(f"Error completing bookings: {e}")
+            return completed
+    
+    def _complete_due(self, due: Callable, batch_size: int) -> int:
+        completed = 0
+        while True:
+            batch = due(self.client.table("bookings").select("id, user_id, slot_id, vehicle_number").eq("booking_status", "confirmed")).limit(batch_size).execute()
+            if not batch.data:
+                break
+            
+            booking_ids = [b["id"] for b in batch.data]
+            updated = self.client.table("bookings").update({"booking_status": "completed"}).in_("id", booking_ids).eq("booking_status", "confirmed").execute()
+            # Rows the update skipped (RLS, or changed concurrently) would be selected again forever
+            if not updated.data:
+                break
+            
+            self._emit("booking_status", booking_ids=[b["id"] for b in updated.data], status="completed")
+            slot_ids = list({b["slot_id"] for b in updated.data})
+            freed = self.client.table("charging_slots").update({"is_available": True}).in_("id", slot_ids).execute()
+            self._emit("slot_availability", slot_ids=slot_ids, is_available=True)
+            self.enqueue_booking_notifications("booking_completed", updated.data, {row["id"]: row for row in freed.data})
+            
+            completed += len(updated.data)
+            if len(batch.data) < batch_size:
+                break
+        return completed
+    
+    @invalidates("bookings")
+    def archive_bookings_before(self, cutoff: str, batch_size: int = 500) -> int:
+        """Move finished bookings created before cutoff to bookings_archive, in batches
+        
+        Each batch is copied, verified to be present in the archive, and only then deleted
+        from bookings; a failed batch leaves its rows in place for the next run.
+        """
+        if not self.has_archive():
+            return 0
+        archived = 0
+        try:
+            while True:
+                batch = self.client.table("bookings").select("*, users(username), charging_slots(location, slot_number)").in_("booking_status", list(FINISHED)).lt("created_at", cutoff).order("created_at").limit(batch_size).execute()
+                if not batch.data:
+                    break
+                
+                booking_ids = [b["id"] for b in batch.data]
+                # Upsert so a batch that was copied but not deleted last time can be retried
+                self.client.table("bookings_archive").upsert([_archive_row(b) for b in batch.data], on_conflict="id").execute()
+                copied = self.client.table("bookings_archive").select("id").in_("id", booking_ids).execute()
+                if len(copied.data) != len(booking_ids):
+                    print(f"Archive verification failed: {len(copied.data)} of {len(booking_ids)} bookings copied")
+                    break
+                self.client.table("bookings").delete().in_("id", booking_ids).in_("booking_status", list(FINISHED)).execute()
+                
+                archived += len(booking_ids)
+                if len(batch.data) < batch_size:
+                    break
+            return archived
+        except Exception as e:
+            print(f"Error archiving bookings: {e}")
+            return archived
+    
+    @cached_read("bookings")
+    def get_booking_by_id(self, booking_id: str) -> Optional[Booking]:
         try:
             response = self.client.table("bookings").select("*, users(username), charging_slots(*)").eq("id", booking_id).execute()
-            return response.data[0] if response.data else None
+            return Booking.from_row(response.data[0]) if response.data else None
         except Exception as e:
             print(f"Error getting booking: {e}")
-            return None
\ No newline at end of file
+            read_failed()
+            return None
+    
+    def get_bookings_starting_between(self, start: str, end: str) -> List[Booking]:
+        if not self.has_feature("start_time"):
+            return []
+        try:
+            response = self.client.table("bookings").select("*, users(username), charging_slots(*)").eq("booking_status", "confirmed").gte("start_time", start).lte("start_time", end).execute()
+            return bookings_from_rows(response.data)
+        except Exception as e:
+            print(f"Error getting upcoming bookings: {e}")
+            read_failed()
+            return []
+    
+    # Notification outbox operations
+    def enqueue_booking_notifications(self, kind: str, bookings: List[Dict[str, Any]],
+                                      slots: Dict[str, Dict[str, Any]] = None) -> int:
+        """Write one outbox entry per booking row; failures are logged, never raised
+        
+        The slot shown in each message comes from `slots` (slot_id -> row) or the row's
+        charging_slots embed; slots found in neither are read in one query.
+        """
+        if not bookings or not self.has_feature("outbox"):
+            return 0
+        slots = dict(slots or {})
+        missing = list({b.get("slot_id") for b in bookings if not b.get("charging_slots") and b.get("slot_id") not in slots})
+        if missing:
+            try:
+                response = self.client.table("charging_slots").select("id, location, slot_number").in_("id", missing).execute()
+                slots.update((row["id"], row) for row in response.data)
+            except Exception as e:
+                print(f"Error reading slots for notifications: {e}")
+        rows = []
+        for booking in bookings:
+            slot = slots.get(booking.get("slot_id")) or booking.get("charging_slots") or {}
+            rows.append({
+                "kind": kind,
+                "booking_id": booking.get("id"),
+                "user_id": booking.get("user_id"),
+                "dedupe_key": f"{kind}:{booking.get('id')}",
+                "payload": {
+                    "vehicle_number": booking.get("vehicle_number"),
+                    "location": slot.get("location"),
+                    "slot_number": slot.get("slot_number"),
+                    "start_time": booking.get("start_time"),
+                },
+            })
+        return self.enqueue_notifications(rows)
+    
+    def enqueue_notifications(self, rows: List[Dict[str, Any]]) -> int:
+        """Insert outbox rows, skipping any whose dedupe_key is already queued"""
+        if not rows or not self.has_feature("outbox"):
+            return 0
+        try:
+            response = self.client.table("notification_outbox").upsert(rows, on_conflict="dedupe_key", ignore_duplicates=True).execute()
+            return len(response.data)
+        except Exception as e:
+            print(f"Error enqueueing notifications: {e}")
+            return 0
+    
+    def get_due_notifications(self, now: str, limit: int) -> List[Dict[str, Any]]:
+        if not self.has_feature("outbox"):
+            return []
+        try:
+            response = self.client.table("notification_outbox").select("*").eq("status", "pending").lte("next_attempt_at", now).order("created_at").limit(limit).execute()
+            return response.data
+        except Exception as e:
+            print(f"Error getting due notifications: {e}")
+            read_failed()
+            return []
+    
+    def mark_notifications_sent(self, notification_ids: List[str]) -> bool:
+        try:
+            self.client.table("notification_outbox").update({"status": "sent", "sent_at": "now()"}).in_("id", notification_ids).execute()
+            return True
+        except Exception as e:
+            print(f"Error marking notifications sent: {e}")
+            return False
+    
+    def reschedule_notification(self, notification_id: str, attempts: int, next_attempt_at: str,
+                                error: str, dead: bool = False) -> bool:
+        try:
+            self.client.table("notification_outbox").update({
+                "status": "dead" if dead else "pending",
+                "attempts": attempts,
+                "next_attempt_at": next_attempt_at,
+                "last_error": error
+            }).eq("id", notification_id).execute()
+            return True
+        except Exception as e:
+            print(f"Error rescheduling notification: {e}")
+            return False
+    
+    def get_usernames(self, user_ids: List[str]) -> Dict[str, str]:
+        try:
+            response = self.client.table("users").select("id, username").in_("id", user_ids).execute()
+            return {row["id"]: row["username"] for row in response.data}
+        except Exception as e:
+            print(f"Error getting usernames: {e}")
+            read_failed()
+            return {}
+    
+    # Shard moves (see src/sharding.py)
+    def export_location(self, location: str, chunk_size: int = 100) -> Dict[str, List[Dict[str, Any]]]:
+        """Raw slot and booking rows of one location, plus the users those bookings reference"""
+        slots = self.client.table("charging_slots").select("*").eq("location", location).execute().data
+        slot_ids = [slot["id"] for slot in slots]
+        bookings = []
+        for i in range(0, len(slot_ids), chunk_size):
+            bookings += self.client.table("bookings").select("*").in_("slot_id", slot_ids[i:i + chunk_size]).execute().data
+        archived = []
+        if self.has_archive():
+            archived = self.client.table("bookings_archive").select("*").eq("location", location).execute().data
+        users = self.export_users(list({booking["user_id"] for booking in bookings + archived}), chunk_size)
+        return {"users": users, "charging_slots": slots, "bookings": bookings, "bookings_archive": archived}
+    
+    def export_users(self, user_ids: List[str], chunk_size: int = 100) -> List[Dict[str, Any]]:
+        """Raw user rows, for replicating users onto another shard"""
+        users = []
+        for i in range(0, len(user_ids), chunk_size):
+            users += self.client.table("users").select("*").in_("id", user_ids[i:i + chunk_size]).execute().data
+        return users
+    
+    @invalidates("users", "slots", "bookings")
+    def import_rows(self, table: str, rows: List[Dict[str, Any]], chunk_size: int = 500) -> int:
+        """Upsert raw rows, keeping their ids; returns how many were written"""
+        written = 0
+        for i in range(0, len(rows), chunk_size):
+            response = self.client.table(table).upsert(rows[i:i + chunk_size], on_conflict="id").execute()
+            written += len(response.data)
+        return written
+    
+    def count_rows(self, table: str, ids: List[str], chunk_size: int = 100) -> int:
+        """How many of the given ids exist in table"""
+        found = 0
+        for i in range(0, len(ids), chunk_size):
+            found += len(self.client.table(table).select("id").in_("id", ids[i:i + chunk_size]).execute().data)
+        return found
+    
+    @invalidates("slots", "bookings")
+    def delete_location(self, location: str, chunk_size: int = 100) -> int:
+        """Delete a location's bookings, archived bookings and slots after it moved to another shard"""
+        if self.has_archive():
+            self.client.table("bookings_archive").delete().eq("location", location).execute()
+        slots = self.client.table("charging_slots").select("id").eq("location", location).execute().data
+        slot_ids = [slot["id"] for slot in slots]
+        for i in range(0, len(slot_ids), chunk_size):
+            self.client.table("bookings").delete().in_("slot_id", slot_ids[i:i + chunk_size]).execute()
+            self.client.table("charging_slots").delete().in_("id", slot_ids[i:i + chunk_size]).execute()
+        return len(slot_ids)
@@ -0,0 +1,300 @@
+import contextlib
+import dataclasses
+import json
+import os
+import re
+import struct
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from . import filelock
+
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "events")
+
+# Record framing: little-endian payload length followed by the JSON payload
+_HEADER = struct.Struct("<I")
+# Bumped whenever DerivedState changes shape; older snapshots are ignored and rebuilt
+SNAPSHOT_VERSION = 1
+# Records are binary; keep Windows from translating newlines in them
+_O_BINARY = getattr(os, "O_BINARY", 0)
+_SEGMENT_NAME = re.compile(r"^events\.(\d+)\.log$")
+
+def _encode(obj: Any) -> Any:
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if dataclasses.is_dataclass(obj):
+        return {name: getattr(obj, name) for name in obj.__slots__}
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+class DerivedState:
+    """In-memory state rebuilt from booking and slot events"""
+    
+    def __init__(self):
+        # slot_id -> {"location", "slot_number", "latitude", "longitude", "is_available"}
+        self.slots: Dict[str, Dict[str, Any]] = {}
+        # Confirmed bookings: booking_id -> (user_id, slot_id)
+        self.active_bookings: Dict[str, Tuple[str, str]] = {}
+        self.status_counts: Dict[str, int] = {}
+        self.total_bookings = 0
+    
+    def apply(self, event: str, data: Dict[str, Any]) -> None:
+        if event == "slot_created":
+            slot = data["slot"]
+            self.slots[slot["id"]] = {key: slot.get(key) for key in
+                                      ("location", "slot_number", "latitude", "longitude", "is_available")}
+        elif event == "slot_deleted":
+            for slot_id in data["slot_ids"]:
+                self.slots.pop(slot_id, None)
+        elif event == "slot_availability":
+            for slot_id in data["slot_ids"]:
+                if slot_id in self.slots:
+                    self.slots[slot_id]["is_available"] = data["is_available"]
+        elif event == "booking_created":
+            self.active_bookings[data["booking_id"]] = (data["user_id"], data["slot_id"])
+            self.status_counts["confirmed"] = self.status_counts.get("confirmed", 0) + 1
+            self.total_bookings += 1
+        elif event == "booking_status":
+            status = data["status"]
+            for booking_id in data["booking_ids"]:
+                if self.active_bookings.pop(booking_id, None) is not None:
+                    self.status_counts["confirmed"] -= 1
+                self.status_counts[status] = self.status_counts.get(status, 0) + 1
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "slots": self.slots,
+            "active_bookings": {booking_id: list(pair) for booking_id, pair in self.active_bookings.items()},
+            "status_counts": self.status_counts,
+            "total_bookings": self.total_bookings,
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DerivedState":
+        state = cls()
+        state.slots = data["slots"]
+        state.active_bookings = {booking_id: tuple(pair) for booking_id, pair in data["active_bookings"].items()}
+        state.status_counts = data["status_counts"]
+        state.total_bookings = data["total_bookings"]
+        return state
+    
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "slots": len(self.slots),
+            "active_bookings": len(self.active_bookings),
+            "total_bookings": self.total_bookings,
+            "status_counts": dict(self.status_counts),
+        }
+
+class EventLog:
+    """Append-only log of booking and slot transitions with snapshot + tail replay
+    
+    Every Database write is appended as one framed record to the newest log segment
+    (`events.<n>.log`), shared by all workers. Each process keeps a DerivedState by
+    replaying records it has not seen yet (catch_up), which also picks up other
+    workers' writes. A snapshot stores the state as versioned JSON together with the
+    segment and offset it covers, then starts a new segment and deletes the ones
+    before it, so a restart loads the snapshot and replays only the tail and the log
+    on disk stays bounded by the snapshot interval.
+    """
+    
+    def __init__(self, directory: str = None):
+        self.directory = directory or os.getenv("EVENT_LOG_DIR", DEFAULT_DIR)
+        os.makedirs(self.directory, exist_ok=True)
+        self.snapshot_path = os.path.join(self.directory, "snapshot.json")
+        self.state = DerivedState()
+        segments = self._segments()
+        if not segments:
+            os.close(os.open(self._segment_path(0), os.O_WRONLY | os.O_CREAT, 0o600))
+            segments = [0]
+        # Read position: segment number and byte offset within it
+        self.segment = segments[0]
+        self.offset = 0
+        self.snapshot_segment = self.snapshot_offset = 0
+        self.subscribers: List[Callable[[str, Dict[str, Any]], None]] = []
+        # Appends and rotation serialize on one lock file, so no record lands in a
+        # segment after the next one exists
+        self._append_lock = os.open(os.path.join(self.directory, "append.lock"), os.O_RDWR | os.O_CREAT, 0o600)
+        self._fd: Optional[int] = None
+        self._fd_segment = -1
+        self._lock = threading.Lock()
+    
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"events.{segment:08d}.log")
+    
+    def _segments(self) -> List[int]:
+        return sorted(int(m.group(1)) for m in map(_SEGMENT_NAME.match, os.listdir(self.directory)) if m)
+    
+    @contextlib.contextmanager
+    def _appending(self):
+        filelock.lock(self._append_lock)
+        try:
+            yield
+        finally:
+            filelock.unlock(self._append_lock)
+    
+    def subscribe(self, listener: Callable[[str, Dict[str, Any]], None]) -> None:
+        """Receive every replayed event, including ones written by other workers"""
+        self.subscribers.append(listener)
+    
+    def append(self, event: str, data: Dict[str, Any]) -> None:
+        """Database change listener: frame and append one record to the newest segment"""
+        payload = json.dumps({"e": event, "d": data}, separators=(",", ":"), default=_encode).encode("utf-8")
+        record = _HEADER.pack(len(payload)) + payload
+        with self._appending():
+            # A newer segment, or compaction having deleted this one, means it is sealed
+            if (self._fd is None or os.fstat(self._fd).st_nlink == 0
+                    or os.path.exists(self._segment_path(self._fd_segment + 1))):
+                if self._fd is not None:
+                    os.close(self._fd)
+                self._fd_segment = self._segments()[-1]
+                self._fd = os.open(self._segment_path(self._fd_segment), os.O_WRONLY | os.O_APPEND | os.O_CREAT | _O_BINARY, 0o600)
+            os.write(self._fd, record)
+    
+    def catch_up(self) -> int:
+        """Apply records appended since the last call; returns how many were applied"""
+        with self._lock:
+            applied = 0
+            while True:
+                try:
+                    applied += self._read_segment()
+                except FileNotFoundError:
+                    # Compacted away while this process lagged behind: resume from the snapshot
+                    if not self._load_snapshot() or not os.path.exists(self._segment_path(self.segment)):
+                        self.segment, self.offset = self._segments()[0], 0
+                    continue
+                if not os.path.exists(self._segment_path(self.segment + 1)):
+                    return applied
+                # The next segment exists, so this one is sealed: drain what landed
+                # since the read above and move on
+                applied += self._read_segment()
+                self.segment, self.offset = self.segment + 1, 0
+    
+    def _read_segment(self) -> int:
+        with open(self._segment_path(self.segment), "rb") as f:
+            f.seek(self.offset)
+            applied, buffer = 0, b""
+            while True:
+                chunk = f.read(1 << 22)
+                if not chunk:
+                    return applied
+                buffer += chunk
+                position = 0
+                while position + _HEADER.size <= len(buffer):
+                    (length,) = _HEADER.unpack_from(buffer, position)
+                    end = position + _HEADER.size + length
+                    if end > len(buffer):
+                        break  # record continues in the next chunk, or is still being written
+                    record = json.loads(buffer[position + _HEADER.size:end])
+                    self.state.apply(record["e"], record["d"])
+                    for listener in self.subscribers:
+                        listener(record["e"], record["d"])
+                    position = end
+                    applied += 1
+                self.offset += position
+                buffer = buffer[position:]
+    
+    def snapshot(self) -> int:
+        """Catch up, atomically write the state and the position it covers, then compact the log"""
+        self.catch_up()
+        with self._lock:
+            blob = json.dumps({"version": SNAPSHOT_VERSION, "segment": self.segment, "offset": self.offset,
+                               "state": self.state.to_dict()}, separators=(",", ":"), default=_encode)
+            segment, offset = self.segment, self.offset
+        tmp_path = f"{self.snapshot_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(blob)
+        os.replace(tmp_path, self.snapshot_path)
+        self.snapshot_segment, self.snapshot_offset = segment, offset
+        self._rotate(segment)
+        return offset
+    
+    def _rotate(self, segment: int) -> None:
+        """Start the segment after `segment` and delete the ones the snapshot made redundant
+        
+        `segment` itself is kept: records after the snapshot offset are still needed.
+        """
+        with self._appending():
+            next_path = self._segment_path(segment + 1)
+            if not os.path.exists(next_path):
+                os.close(os.open(next_path, os.O_WRONLY | os.O_CREAT, 0o600))
+        for old in self._segments():
+            if old < segment:
+                try:
+                    os.remove(self._segment_path(old))
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    # Windows cannot delete a segment another worker still has open; a later snapshot will
+                    print(f"Error deleting event log segment {old}: {e}")
+    
+    def _load_snapshot(self) -> bool:
+        """Replace the state with the snapshot; False when there is none or it is unusable"""
+        try:
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+            if snapshot.get("version") != SNAPSHOT_VERSION:
+                print(f"Ignoring event log snapshot with version {snapshot.get('version')}")
+                return False
+            state = DerivedState.from_dict(snapshot["state"])
+        except FileNotFoundError:
+            return False
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            print(f"Error loading event log snapshot: {e}")
+            return False
+        self.state = state
+        self.segment = self.snapshot_segment = snapshot["segment"]
+        self.offset = self.snapshot_offset = snapshot["offset"]
+        return True
+    
+    def restore(self, bootstrap: Optional[Callable[[], List[Tuple[str, Dict[str, Any]]]]] = None) -> int:
+        """Load the latest snapshot and replay the tail; returns the number of replayed records
+        
+        Without a usable snapshot the log is replayed from the start if it is still
+        complete and non-empty. Otherwise `bootstrap` is called to produce seed events
+        from the current tables, which are applied directly and saved in a first snapshot.
+        """
+        lock_fd = os.open(os.path.join(self.directory, "restore.lock"), os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            # Workers starting together must not bootstrap the same state twice
+            filelock.lock(lock_fd)
+            try:
+                return self._restore(bootstrap)
+            finally:
+                filelock.unlock(lock_fd)
+        finally:
+            os.close(lock_fd)
+    
+    def _restore(self, bootstrap) -> int:
+        with self._lock:
+            loaded = self._load_snapshot()
+        if loaded:
+            return self.catch_up()
+        segments = self._segments()
+        complete = segments[0] == 0 and (len(segments) > 1 or os.path.getsize(self._segment_path(0)) > 0)
+        if bootstrap is None or complete:
+            with self._lock:
+                self.state, self.segment, self.offset = DerivedState(), segments[0], 0
+            return self.catch_up()
+        # Seed from the tables, starting the replay at the current end of the log. The
+        # seed is not appended: running workers already hold these rows in their state
+        with self._lock:
+            self.state, self.segment = DerivedState(), segments[-1]
+            self.offset = os.path.getsize(self._segment_path(self.segment))
+        # Round-trip through JSON so seed events look exactly like replayed records
+        seeded = json.loads(json.dumps(bootstrap(), default=_encode))
+        with self._lock:
+            for event, data in seeded:
+                self.state.apply(event, data)
+        replayed = len(seeded) + self.catch_up()
+        self.snapshot()
+        return replayed
+    
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "segment": self.segment,
+            "offset": self.offset,
+            "snapshot_segment": self.snapshot_segment,
+            "snapshot_offset": self.snapshot_offset,
+            **self.state.metrics(),
+        }
@@ -0,0 +1,51 @@
+import os
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+# Cross-process advisory locks on an open file descriptor: flock on POSIX, msvcrt byte
+# range locks on Windows. msvcrt has no shared mode, so shared locks are exclusive there.
+
+# Whether locks actually exclude other processes on this platform
+AVAILABLE = fcntl is not None or msvcrt is not None
+
+# msvcrt locks bytes from the current position; a byte far past any file contents is
+# locked so the lock never blocks reading or writing the data itself
+_WINDOWS_LOCK_OFFSET = 1 << 30
+_WINDOWS_RETRY_SECONDS = 0.05
+
+def lock(fd: int, shared: bool = False, blocking: bool = True) -> bool:
+    """Lock fd against other processes; False if blocking is off and the lock is held elsewhere"""
+    if fcntl is not None:
+        try:
+            fcntl.flock(fd, (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            return False
+        return True
+    if msvcrt is not None:
+        while True:
+            os.lseek(fd, _WINDOWS_LOCK_OFFSET, os.SEEK_SET)
+            try:
+                # LK_LOCK gives up after 10 seconds, so block by retrying LK_NBLCK instead
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                if not blocking:
+                    return False
+                time.sleep(_WINDOWS_RETRY_SECONDS)
+    return True
+
+def unlock(fd: int) -> None:
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    elif msvcrt is not None:
+        os.lseek(fd, _WINDOWS_LOCK_OFFSET, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
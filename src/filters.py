@@ -0,0 +1,101 @@
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .models import parse_timestamp
+
+class FilterError(ValueError):
+    """A filter or sort key outside the allow-list"""
+
+# Public field -> (column, allowed operators). Every filter and sort column leads an
+# index in sql/003_list_indexes.sql, except location on bookings: it filters the
+# embedded charging_slots through an inner join, served by the slot location index
+# and bookings_slot_status_idx on the join column.
+BOOKING_FILTERS: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "status": ("booking_status", ("eq", "in")),
+    "location": ("charging_slots.location", ("eq", "in")),
+    "slot_id": ("slot_id", ("eq", "in")),
+    "user": ("user_id", ("eq", "in")),
+    "created_at": ("created_at", ("gt", "gte", "lt", "lte")),
+    "vehicle_type": ("vehicle_type", ("eq", "in")),
+}
+BOOKING_SORTS = {"created_at": "created_at", "start_time": "start_time", "status": "booking_status"}
+
+SLOT_FILTERS: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "location": ("location", ("eq", "in")),
+    "available": ("is_available", ("eq",)),
+    "slot_number": ("slot_number", ("eq", "in")),
+}
+SLOT_SORTS = {"location": "location", "slot_number": "slot_number", "created_at": "created_at"}
+
+MAX_TERMS = 8
+MAX_IN_VALUES = 100
+
+# Parsed forms are tuples so they can key the read caches
+Filters = Tuple[Tuple[str, str, Any], ...]
+Sort = Tuple[Tuple[str, bool], ...]
+
+def _coerce(column: str, value: str) -> Any:
+    if column == "is_available":
+        if value.lower() not in ("true", "false"):
+            raise FilterError(f"Expected true or false for available, got {value!r}")
+        return value.lower() == "true"
+    if column == "slot_number":
+        try:
+            return int(value)
+        except ValueError:
+            raise FilterError(f"Expected an integer for slot_number, got {value!r}")
+    if column == "created_at" and parse_timestamp(value) is None:
+        # Checked here, since list reads turn an upstream error into an empty page
+        raise FilterError(f"Expected an ISO date or timestamp for created_at, got {value!r}")
+    return value
+
+def parse_filters(terms: Iterable[str], allowed: Dict[str, Tuple[str, Tuple[str, ...]]]) -> Filters:
+    """Parse `field:op:value` terms (values of `in` separated by `|`) into (column, op, value)"""
+    parsed = []
+    for term in terms:
+        parts = term.split(":", 2)
+        if len(parts) != 3 or not parts[2]:
+            raise FilterError(f"Filter {term!r} must look like field:op:value")
+        field, op, value = parts
+        if field not in allowed:
+            raise FilterError(f"Cannot filter on {field!r}; allowed: {', '.join(sorted(allowed))}")
+        column, ops = allowed[field]
+        if op not in ops:
+            raise FilterError(f"Operator {op!r} not allowed for {field!r}; allowed: {', '.join(ops)}")
+        if op == "in":
+            values = value.split("|")
+            if len(values) > MAX_IN_VALUES:
+                raise FilterError(f"At most {MAX_IN_VALUES} values allowed in an 'in' filter")
+            parsed.append((column, op, tuple(_coerce(column, v) for v in values)))
+        else:
+            parsed.append((column, op, _coerce(column, value)))
+    if len(parsed) > MAX_TERMS:
+        raise FilterError(f"At most {MAX_TERMS} filters allowed")
+    return tuple(parsed)
+
+def parse_sort(spec: Optional[str], allowed: Dict[str, str]) -> Sort:
+    """Parse `field,-field` (leading '-' for descending) into (column, descending)"""
+    parsed = []
+    for key in filter(None, (spec or "").split(",")):
+        field, desc = (key[1:], True) if key.startswith("-") else (key, False)
+        if field not in allowed:
+            raise FilterError(f"Cannot sort on {field!r}; allowed: {', '.join(sorted(allowed))}")
+        parsed.append((allowed[field], desc))
+    return tuple(parsed)
+
+def apply_query(query, filters: Filters, sort: Sort):
+    """Push parsed filters and sort keys down into a PostgREST query builder"""
+    for column, op, value in filters:
+        query = query.in_(column, list(value)) if op == "in" else getattr(query, op)(column, value)
+    for column, desc in sort:
+        query = query.order(column, desc=desc)
+    # Unique tie-breaker keeps pagination stable across pages
+    return query.order("id")
+
+def merge_page(records: List[Any], sort: Sort, offset: int = 0, limit: Optional[int] = None) -> List[Any]:
+    """Order records gathered from several queries the way apply_query would, then cut one page
+    
+    Sort columns are read as record attributes; nulls sort last ascending, as in Postgres.
+    """
+    for column, desc in reversed(tuple(sort) + (("id", False),)):
+        records.sort(key=lambda record: (getattr(record, column) is None, getattr(record, column)), reverse=desc)
+    return records[offset:offset + limit] if limit else records[offset:]
@@ -0,0 +1,234 @@
+import copy
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+# In-process stand-in for a Supabase project, selected with a `memory://<name>` URL.
+# It implements the slice of the PostgREST query builder that Database uses, so
+# several local backends can be wired into the shard router without any servers.
+
+# Foreign key column used to resolve each embedded table
+EMBEDS = {"users": "user_id", "charging_slots": "slot_id"}
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+# Column defaults applied on insert, mirroring the Supabase schema
+DEFAULTS: Dict[str, Callable[[], Dict[str, Any]]] = {
+    "users": lambda: {"role": "user", "is_active": True},
+    "charging_slots": lambda: {"is_available": True, "latitude": None, "longitude": None},
+    "bookings": lambda: {"booking_status": "confirmed", "vehicle_type": None, "start_time": None,
+                         "cancelled_at": None},
+    "bookings_archive": lambda: {"archived_at": _now()},
+    "notification_outbox": lambda: {"status": "pending", "attempts": 0, "next_attempt_at": _now(),
+                                    "payload": {}, "last_error": None, "sent_at": None},
+}
+
+class Response:
+    def __init__(self, data: List[Dict[str, Any]], count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+def _split_columns(spec: str) -> List[str]:
+    """Split a select list on top-level commas, keeping embeds like `users(username)` whole"""
+    parts, depth, current = [], 0, ""
+    for char in spec:
+        if char == "," and depth == 0:
+            parts.append(current.strip())
+            current = ""
+            continue
+        depth += (char == "(") - (char == ")")
+        current += char
+    if current.strip():
+        parts.append(current.strip())
+    return parts
+
+def _project(row: Dict[str, Any], columns: List[str]) -> Dict[str, Any]:
+    return dict(row) if "*" in columns else {c: row.get(c) for c in columns}
+
+def _value(row: Dict[str, Any], column: str) -> Any:
+    if "." in column:
+        embedded, column = column.split(".", 1)
+        return (row.get(embedded) or {}).get(column)
+    return row.get(column)
+
+def _compare(op: str, left: Any, right: Any) -> bool:
+    if op == "in":
+        return left in right
+    if op == "is":
+        return left is right
+    if left is None:
+        return False
+    if isinstance(left, bool) and isinstance(right, str):
+        right = right.lower() == "true"
+    return {"eq": left == right, "neq": left != right, "gt": left > right, "gte": left >= right,
+            "lt": left < right, "lte": left <= right}[op]
+
+class LocalQuery:
+    def __init__(self, store: "LocalStore", table: str):
+        self.store = store
+        self.table = table
+        self.action = "select"
+        self.columns = ["*"]
+        self.embeds: Dict[str, Any] = {}
+        self.payload: Any = None
+        self.on_conflict = "id"
+        self.ignore_duplicates = False
+        self.count = None
+        self.filters: List[Any] = []
+        self.orders: List[Any] = []
+        self.bounds: Optional[tuple] = None
+
+    # Actions
+    def select(self, spec: str = "*", count: str = None) -> "LocalQuery":
+        self.columns, self.embeds, self.count = [], {}, count
+        for part in _split_columns(spec):
+            if "(" in part:
+                name, columns = part.rstrip(")").split("(", 1)
+                table, _, hint = name.partition("!")
+                self.embeds[table] = ([c.strip() for c in columns.split(",")], hint == "inner")
+            else:
+                self.columns.append(part)
+        return self
+
+    def insert(self, rows: Any) -> "LocalQuery":
+        self.action, self.payload = "insert", rows if isinstance(rows, list) else [rows]
+        return self
+
+    def upsert(self, rows: Any, on_conflict: str = "id", ignore_duplicates: bool = False) -> "LocalQuery":
+        self.insert(rows)
+        self.action, self.on_conflict, self.ignore_duplicates = "upsert", on_conflict, ignore_duplicates
+        return self
+
+    def update(self, data: Dict[str, Any]) -> "LocalQuery":
+        self.action, self.payload = "update", data
+        return self
+
+    def delete(self) -> "LocalQuery":
+        self.action = "delete"
+        return self
+
+    # Filters and modifiers
+    def _filter(self, op: str, column: str, value: Any) -> "LocalQuery":
+        self.filters.append((column, op, value))
+        return self
+
+    def eq(self, column, value): return self._filter("eq", column, value)
+    def neq(self, column, value): return self._filter("neq", column, value)
+    def gt(self, column, value): return self._filter("gt", column, value)
+    def gte(self, column, value): return self._filter("gte", column, value)
+    def lt(self, column, value): return self._filter("lt", column, value)
+    def lte(self, column, value): return self._filter("lte", column, value)
+    def in_(self, column, values): return self._filter("in", column, list(values))
+    def is_(self, column, value): return self._filter("is", column, None if value == "null" else value)
+
+    def order(self, column: str, desc: bool = False) -> "LocalQuery":
+        self.orders.append((column, desc))
+        return self
+
+    def limit(self, count: int) -> "LocalQuery":
+        self.bounds = (0, count - 1)
+        return self
+
+    def range(self, start: int, end: int) -> "LocalQuery":
+        self.bounds = (start, end)
+        return self
+
+    def execute(self) -> Response:
+        with self.store.lock:
+            return getattr(self, f"_{self.action}")()
+
+    # Execution
+    def _embedded(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        row = dict(row)
+        for table, (columns, _) in self.embeds.items():
+            target = self.store.tables[table].get(row.get(EMBEDS[table]))
+            row[table] = _project(target, columns) if target else None
+        return row
+
+    def _matches(self) -> List[Dict[str, Any]]:
+        rows = [self._embedded(row) for row in self.store.tables[self.table].values()]
+        rows = [row for row in rows if all(_compare(op, _value(row, column), value)
+                                           for column, op, value in self.filters)]
+        # An inner embed drops rows whose embedded row is missing
+        return [row for row in rows if all(row.get(t) for t, (_, inner) in self.embeds.items() if inner)]
+
+    def _select(self) -> Response:
+        rows = self._matches()
+        for column, desc in reversed(self.orders):
+            # Nulls sort last ascending and first descending, as in Postgres
+            rows.sort(key=lambda row: (_value(row, column) is None, _value(row, column)), reverse=desc)
+        total = len(rows)
+        if self.bounds:
+            rows = rows[self.bounds[0]:self.bounds[1] + 1]
+        embeds = list(self.embeds)
+        data = [dict(_project(row, self.columns), **{t: row[t] for t in embeds}) for row in rows]
+        return Response(copy.deepcopy(data), total if self.count else None)
+
+    def _resolve(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: _now() if v == "now()" else v for k, v in data.items()}
+
+    def _new_row(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        return {**DEFAULTS.get(self.table, dict)(), "id": str(uuid.uuid4()), "created_at": _now(), **self._resolve(row)}
+
+    def _insert(self) -> Response:
+        table, inserted = self.store.tables[self.table], []
+        for row in self.payload:
+            row = self._new_row(row)
+            table[row["id"]] = row
+            inserted.append(row)
+        return Response(copy.deepcopy(inserted))
+
+    def _upsert(self) -> Response:
+        table, written = self.store.tables[self.table], []
+        for row in self.payload:
+            existing = next((r for r in table.values() if self.on_conflict in row
+                             and r.get(self.on_conflict) == row[self.on_conflict]), None)
+            if existing is None:
+                row = self._new_row(row)
+                table[row["id"]] = row
+            elif self.ignore_duplicates:
+                continue
+            else:
+                existing.update(self._resolve(row))
+                row = existing
+            written.append(row)
+        return Response(copy.deepcopy(written))
+
+    def _update(self) -> Response:
+        rows = self._matches()
+        table, changes = self.store.tables[self.table], self._resolve(self.payload)
+        for row in rows:
+            table[row["id"]].update(changes)
+        return Response(copy.deepcopy([table[row["id"]] for row in rows]))
+
+    def _delete(self) -> Response:
+        rows = self._matches()
+        table = self.store.tables[self.table]
+        return Response(copy.deepcopy([table.pop(row["id"]) for row in rows]))
+
+class LocalStore:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.tables: Dict[str, Dict[str, Dict[str, Any]]] = {name: {} for name in DEFAULTS}
+
+class LocalClient:
+    """Minimal stand-in for a supabase Client backed by an in-process LocalStore"""
+
+    # Stores are shared by name so every Database in the process sees the same data
+    stores: Dict[str, LocalStore] = {}
+    _lock = threading.Lock()
+
+    def __init__(self, store: LocalStore):
+        self.store = store
+
+    @classmethod
+    def connect(cls, url: str) -> "LocalClient":
+        name = url[len("memory://"):]
+        with cls._lock:
+            store = cls.stores.setdefault(name, LocalStore())
+        return cls(store)
+
+    def table(self, name: str) -> LocalQuery:
+        return LocalQuery(self.store, name)
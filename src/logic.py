@@ -1,44 +1,52 @@
-from datetime import datetime, timedelta
-from .db import Database
+import time
+from datetime import datetime, timedelta, timezone
+from .sharding import ShardMoving, connect
+from .models import BookingStatus
+from .cache import namespace_versions
 from typing import List, Dict, Any, Optional
 
+# The scheduled admin dashboard refresh stops once no admin has opened it for this long
+ADMIN_DASHBOARD_IDLE_SECONDS = 600
+
 class BookingLogic:
     def __init__(self):
-        self.db = Database()
+        self.db = connect()
+        # Precomputed admin dashboard: (day, slot/booking versions, data)
+        self._admin_dashboard = None
+        self._admin_viewed_at: Optional[float] = None
     
     def validate_booking(self, user_id: str, slot_id: str) -> tuple[bool, str]:
         """Validate if a booking can be made"""
         try:
             # Check if user exists and is active
             user = self.db.get_user_by_id(user_id)
-            if not user or not user.get("is_active", True):
+            if not user or not user.is_active:
                 return False, "User not found or inactive"
             
             # Check if slot exists and is available
-            slots = self.db.get_all_slots()
-            slot = next((s for s in slots if s["id"] == slot_id), None)
+            slot = self.db.get_slot_by_id(slot_id)
             if not slot:
                 return False, "Slot not found"
-            if not slot.get("is_available", True):
+            if not slot.is_available:
                 return False, "Slot is not available"
             
             # Check if user has any active bookings
-            user_bookings = self.db.get_user_bookings(user_id)
-            active_bookings = [b for b in user_bookings if b.get("booking_status") == "confirmed"]
-            if len(active_bookings) >= 3:  # Limit to 3 active bookings per user
+            active_bookings = self.db.list_bookings((("user_id", "eq", user_id), ("booking_status", "eq", "confirmed")))
+            if active_bookings["total"] >= 3:  # Limit to 3 active bookings per user
                 return False, "Maximum 3 active bookings allowed per user"
             
             return True, "Valid"
         except Exception as e:
             return False, f"Validation error: {str(e)}"
     
-    def create_booking(self, user_id: str, slot_id: str, vehicle_number: str, vehicle_type: str = None) -> Dict[str, Any]:
+    def create_booking(self, user_id: str, slot_id: str, vehicle_number: str, vehicle_type: str = None,
+                       start_time: str = None) -> Dict[str, Any]:
         """Create a new booking with validation"""
         is_valid, message = self.validate_booking(user_id, slot_id)
         if not is_valid:
             return {"success": False, "message": message}
         
-        booking = self.db.create_booking(user_id, slot_id, vehicle_number, vehicle_type)
+        booking = self.db.create_booking(user_id, slot_id, vehicle_number, vehicle_type, start_time)
         if booking:
             return {"success": True, "booking": booking, "message": "Booking created successfully"}
         else:
@@ -52,12 +60,12 @@ class BookingLogic:
                 return {"success": False, "message": "Booking not found"}
             
             # Check if user owns the booking (for users) or allow admin to cancel any
-            if user_id and booking.get("user_id") != user_id:
+            if user_id and booking.user_id != user_id:
                 user = self.db.get_user_by_id(user_id)
-                if user and user.get("role") != "admin":
+                if user and user.role != "admin":
                     return {"success": False, "message": "Cannot cancel another user's booking"}
             
-            if booking.get("booking_status") != "confirmed":
+            if booking.booking_status is not BookingStatus.CONFIRMED:
                 return {"success": False, "message": "Only confirmed bookings can be cancelled"}
             
             success = self.db.update_booking_status(booking_id, "cancelled")
@@ -65,35 +73,90 @@ class BookingLogic:
                 return {"success": True, "message": "Booking cancelled successfully"}
             else:
                 return {"success": False, "message": "Failed to cancel booking"}
+        except ShardMoving:
+            raise  # surfaced by the API as a retryable 503
         except Exception as e:
             return {"success": False, "message": f"Error cancelling booking: {str(e)}"}
     
+    def cancel_bookings(self, booking_ids: List[str], user_id: str) -> Dict[str, Any]:
+        """Cancel several bookings in one call (admin only)"""
+        user = self.db.get_user_by_id(user_id)
+        if not user or user.role != "admin":
+            return {"success": False, "message": "Admin access required"}
+        if not booking_ids:
+            return {"success": False, "message": "No bookings selected"}
+        
+        cancelled = self.db.cancel_bookings(booking_ids)
+        return {
+            "success": True,
+            "cancelled": [b.id for b in cancelled],
+            "message": f"{len(cancelled)} booking(s) cancelled"
+        }
+    
     def get_available_slots(self) -> List[Dict[str, Any]]:
         """Get all available slots"""
         return self.db.get_available_slots()
     
-    def get_user_dashboard(self, user_id: str) -> Dict[str, Any]:
-        """Get dashboard data for user"""
-        bookings = self.db.get_user_bookings(user_id)
-        upcoming = [b for b in bookings if b.get("booking_status") == "confirmed"]
-        past = [b for b in bookings if b.get("booking_status") in ["cancelled", "completed"]]
+    def get_user_dashboard(self, user_id: str, include_archive: bool = False) -> Dict[str, Any]:
+        """Get dashboard data for user; past bookings include the archive when asked"""
+        upcoming = self.db.list_bookings((("user_id", "eq", user_id), ("booking_status", "eq", "confirmed")))
+        past = self.db.list_bookings((("user_id", "eq", user_id), ("booking_status", "in", ("cancelled", "completed"))),
+                                     include_archive=include_archive)
         
         return {
-            "upcoming_bookings": upcoming,
-            "past_bookings": past,
-            "total_bookings": len(bookings)
+            "upcoming_bookings": upcoming["bookings"],
+            "past_bookings": past["bookings"],
+            "total_bookings": upcoming["total"] + past["total"]
         }
     
     def get_admin_dashboard(self) -> Dict[str, Any]:
-        """Get dashboard data for admin"""
+        """Get dashboard data for admin, reusing the precomputed copy while it is current"""
+        self._admin_viewed_at = time.monotonic()
+        if self._admin_dashboard_current():
+            return self._admin_dashboard[2]
+        return self._rebuild_admin_dashboard()
+    
+    def refresh_admin_dashboard(self) -> bool:
+        """Scheduled precompute: rebuild only a stale dashboard that an admin opened recently"""
+        idle = self._admin_viewed_at is None or time.monotonic() - self._admin_viewed_at > ADMIN_DASHBOARD_IDLE_SECONDS
+        if idle or self._admin_dashboard_current():
+            return False
+        self._rebuild_admin_dashboard()
+        return True
+    
+    def _admin_dashboard_current(self) -> bool:
+        snapshot = self._admin_dashboard
+        return bool(snapshot) and snapshot[0] == datetime.now().date() and snapshot[1] == namespace_versions("slots", "bookings")
+    
+    def _rebuild_admin_dashboard(self) -> Dict[str, Any]:
+        """Recompute the admin dashboard and keep it until slots or bookings change"""
+        day, versions = datetime.now().date(), namespace_versions("slots", "bookings")
+        data = self._compute_admin_dashboard()
+        self._admin_dashboard = (day, versions, data)
+        return data
+    
+    def complete_stale_bookings(self, max_age_hours: float) -> int:
+        """Complete confirmed bookings that started more than max_age_hours ago and free their slots
+        
+        Bookings without a start time count from when they were made.
+        """
+        cutoff = (datetime.now(timezone.utc) - timedelta(hours=max_age_hours)).isoformat()
+        return self.db.complete_bookings_before(cutoff)
+    
+    def archive_finished_bookings(self, retention_days: float) -> int:
+        """Move cancelled and completed bookings older than retention_days to the archive"""
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=retention_days)).isoformat()
+        return self.db.archive_bookings_before(cutoff)
+    
+    def _compute_admin_dashboard(self) -> Dict[str, Any]:
         slots = self.db.get_all_slots()
         bookings = self.db.get_all_bookings()
         
-        available_slots = len([s for s in slots if s.get("is_available", True)])
-        booked_slots = len([s for s in slots if not s.get("is_available", True)])
+        available_slots = sum(1 for s in slots if s.is_available)
+        booked_slots = len(slots) - available_slots
         
-        today_bookings = [b for b in bookings if 
-                         datetime.fromisoformat(b.get("created_at").replace('Z', '+00:00')).date() == datetime.now().date()]
+        today = datetime.now().date()
+        today_bookings = [b for b in bookings if b.created_at and b.created_at.astimezone().date() == today]
         
         return {
             "total_slots": len(slots),
@@ -105,17 +168,17 @@ class BookingLogic:
 
 class SlotManagement:
     def __init__(self):
-        self.db = Database()
+        self.db = connect()
     
-    def create_slot(self, location: str, slot_number: int) -> Dict[str, Any]:
+    def create_slot(self, location: str, slot_number: int, latitude: float = None,
+                    longitude: float = None) -> Dict[str, Any]:
         """Create a new charging slot"""
         # Check if slot number already exists at location
-        slots = self.db.get_all_slots()
-        existing_slot = next((s for s in slots if s["location"] == location and s["slot_number"] == slot_number), None)
-        if existing_slot:
+        existing_slots = self.db.list_slots((("location", "eq", location), ("slot_number", "eq", slot_number)))
+        if existing_slots["slots"]:
             return {"success": False, "message": "Slot number already exists at this location"}
         
-        slot = self.db.create_charging_slot(location, slot_number)
+        slot = self.db.create_charging_slot(location, slot_number, latitude, longitude)
         if slot:
             return {"success": True, "slot": slot, "message": "Slot created successfully"}
         else:
@@ -124,9 +187,7 @@ class SlotManagement:
     def delete_slot(self, slot_id: str) -> Dict[str, Any]:
         """Delete a charging slot"""
         # Check if slot has active bookings
-        bookings = self.db.get_all_bookings()
-        active_bookings = [b for b in bookings if b.get("slot_id") == slot_id and b.get("booking_status") == "confirmed"]
-        
+        active_bookings = self.db.get_active_bookings_for_slots([slot_id])
         if active_bookings:
             return {"success": False, "message": "Cannot delete slot with active bookings"}
         
@@ -134,4 +195,19 @@ class SlotManagement:
         if success:
             return {"success": True, "message": "Slot deleted successfully"}
         else:
-            return {"success": False, "message": "Failed to delete slot"}
\ No newline at end of file
+            return {"success": False, "message": "Failed to delete slot"}
+    
+    def delete_slots(self, slot_ids: List[str]) -> Dict[str, Any]:
+        """Delete several charging slots in one call"""
+        if not slot_ids:
+            return {"success": False, "message": "No slots selected"}
+        
+        active_bookings = self.db.get_active_bookings_for_slots(slot_ids)
+        if active_bookings:
+            return {"success": False, "message": "Cannot delete slots with active bookings"}
+        
+        success = self.db.delete_slots(slot_ids)
+        if success:
+            return {"success": True, "message": f"{len(slot_ids)} slot(s) deleted"}
+        else:
+            return {"success": False, "message": "Failed to delete slots"}
\ No newline at end of file
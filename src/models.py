@@ -0,0 +1,132 @@
+from dataclasses import dataclass, replace
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, Optional
+
+class BookingStatus(str, Enum):
+    CONFIRMED = "confirmed"
+    CANCELLED = "cancelled"
+    COMPLETED = "completed"
+
+FINISHED_STATUSES = (BookingStatus.CANCELLED, BookingStatus.COMPLETED)
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Parse a Supabase ISO timestamp into an aware datetime (None if missing or malformed)"""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    value = value.replace("Z", "+00:00")
+    # Postgres trims trailing zeros from fractions; fromisoformat before 3.11 wants 3 or 6 digits
+    if "." in value:
+        head, _, rest = value.partition(".")
+        digits = len(rest) - len(rest.lstrip("0123456789"))
+        value = f"{head}.{rest[:digits][:6].ljust(6, '0')}{rest[digits:]}"
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+def parse_status(value: Optional[str]):
+    """Map a status string onto its shared BookingStatus member, keeping unknown values as-is"""
+    try:
+        return BookingStatus(value)
+    except ValueError:
+        return value
+
+# Records are frozen and slotted: each Database row is converted once, shared safely between
+# caches and requests, and serialised natively by orjson. Field names follow the API payloads.
+
+@dataclass(frozen=True)
+class User:
+    __slots__ = ("id", "username", "password", "role", "is_active", "created_at")
+    id: str
+    username: str
+    password: str
+    role: str
+    is_active: bool
+    created_at: Optional[datetime]
+    
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> "User":
+        return cls(
+            id=row.get("id"),
+            username=row.get("username"),
+            password=row.get("password"),
+            role=row.get("role", "user"),
+            is_active=row.get("is_active", True),
+            created_at=parse_timestamp(row.get("created_at")),
+        )
+
+@dataclass(frozen=True)
+class Slot:
+    __slots__ = ("id", "location", "slot_number", "is_available", "latitude", "longitude", "created_at")
+    id: str
+    location: str
+    slot_number: int
+    is_available: bool
+    latitude: Optional[float]
+    longitude: Optional[float]
+    created_at: Optional[datetime]
+    
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> "Slot":
+        return cls(
+            id=row.get("id"),
+            location=row.get("location"),
+            slot_number=row.get("slot_number"),
+            is_available=row.get("is_available", True),
+            latitude=row.get("latitude"),
+            longitude=row.get("longitude"),
+            created_at=parse_timestamp(row.get("created_at")),
+        )
+    
+    def with_availability(self, is_available: bool) -> "Slot":
+        return replace(self, is_available=is_available)
+
+@dataclass(frozen=True)
+class Booking:
+    __slots__ = ("id", "user_id", "slot_id", "vehicle_number", "vehicle_type", "booking_status",
+                 "start_time", "created_at", "cancelled_at", "users", "charging_slots")
+    id: str
+    user_id: str
+    slot_id: str
+    vehicle_number: str
+    vehicle_type: Optional[str]
+    booking_status: BookingStatus
+    start_time: Optional[datetime]
+    created_at: Optional[datetime]
+    cancelled_at: Optional[datetime]
+    users: Optional[Dict[str, str]]
+    charging_slots: Optional[Slot]
+    
+    @classmethod
+    def from_row(cls, row: Dict[str, Any], user_refs: Dict[str, Dict[str, str]] = None,
+                 slots: Dict[str, Slot] = None) -> "Booking":
+        """Build a Booking, sharing embedded user and slot objects through the given lookups"""
+        user = row.get("users")
+        if user is not None and user_refs is not None:
+            user = user_refs.setdefault(user.get("username"), user)
+        slot = row.get("charging_slots")
+        if slot is not None:
+            slot = slots[slot["id"]] if slots is not None and slot.get("id") in slots else Slot.from_row(slot)
+            if slots is not None:
+                slots[slot.id] = slot
+        return cls(
+            id=row.get("id"),
+            user_id=row.get("user_id"),
+            slot_id=row.get("slot_id"),
+            vehicle_number=row.get("vehicle_number"),
+            vehicle_type=row.get("vehicle_type"),
+            booking_status=parse_status(row.get("booking_status")),
+            start_time=parse_timestamp(row.get("start_time")),
+            created_at=parse_timestamp(row.get("created_at")),
+            cancelled_at=parse_timestamp(row.get("cancelled_at")),
+            users=user,
+            charging_slots=slot,
+        )
+
+def bookings_from_rows(rows):
+    """Build Booking records for a result set, sharing repeated user and slot embeds"""
+    user_refs, slots = {}, {}
+    return [Booking.from_row(row, user_refs, slots) for row in rows]
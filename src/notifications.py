@@ -0,0 +1,195 @@
+import json
+import os
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+from typing import Any, Dict, List, Optional, Tuple
+
+from .db import Database
+from .models import parse_timestamp
+
+SUBJECTS = {
+    "booking_confirmed": "Your charging slot is booked",
+    "booking_cancelled": "Your booking was cancelled",
+    "booking_completed": "Your charging session is complete",
+    "booking_reminder": "Reminder: your charging slot starts soon",
+}
+
+def render_message(kind: str, payload: Dict[str, Any]) -> Tuple[str, str]:
+    """Subject and plain-text body for an outbox entry"""
+    subject = SUBJECTS.get(kind, "Booking update")
+    lines = [subject + "."]
+    if payload.get("location"):
+        lines.append(f"Slot: {payload['location']} - Slot {payload.get('slot_number', 'N/A')}")
+    if payload.get("vehicle_number"):
+        lines.append(f"Vehicle: {payload['vehicle_number']}")
+    if payload.get("start_time"):
+        lines.append(f"Starts at: {payload['start_time']}")
+    return subject, "\n".join(lines)
+
+# Transports
+class FileTransport:
+    """Appends each message as a JSON line to a file; a stand-in for SMTP in tests and development"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+    
+    def send(self, recipient: str, subject: str, body: str) -> None:
+        line = json.dumps({"to": recipient, "subject": subject, "body": body, "sent_at": time.time()})
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+class SmtpTransport:
+    """Sends plain-text email; usernames without a domain get recipient_domain appended"""
+    
+    def __init__(self, host: str, port: int = 25, sender: str = "noreply@localhost",
+                 recipient_domain: str = None, username: str = None, password: str = None):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.recipient_domain = recipient_domain
+        self.username = username
+        self.password = password
+    
+    def send(self, recipient: str, subject: str, body: str) -> None:
+        if "@" not in recipient and self.recipient_domain:
+            recipient = f"{recipient}@{self.recipient_domain}"
+        message = EmailMessage()
+        message["From"] = self.sender
+        message["To"] = recipient
+        message["Subject"] = subject
+        message.set_content(body)
+        with smtplib.SMTP(self.host, self.port, timeout=10) as smtp:
+            if self.username:
+                smtp.starttls()
+                smtp.login(self.username, self.password)
+            smtp.send_message(message)
+
+def transport_from_env():
+    """Build the transport selected by NOTIFY_TRANSPORT (file or smtp)"""
+    if os.getenv("NOTIFY_TRANSPORT", "file") == "smtp":
+        return SmtpTransport(
+            host=os.getenv("SMTP_HOST", "localhost"),
+            port=int(os.getenv("SMTP_PORT", "25")),
+            sender=os.getenv("SMTP_SENDER", "noreply@localhost"),
+            recipient_domain=os.getenv("NOTIFY_EMAIL_DOMAIN"),
+            username=os.getenv("SMTP_USERNAME"),
+            password=os.getenv("SMTP_PASSWORD"),
+        )
+    return FileTransport(os.getenv("NOTIFY_FILE", "notifications.jsonl"))
+
+class NotificationDispatcher:
+    """Drains the notification outbox in batches, off the request path
+    
+    Each batch is sent with at most `concurrency` messages in flight. Failed
+    sends are retried with exponential backoff and dead-lettered after
+    `max_attempts`. Meant to run as a scheduler job, which guarantees a single
+    dispatcher across workers.
+    """
+    
+    def __init__(self, db: Database, transport, batch_size: int = 100, concurrency: int = 8,
+                 max_attempts: int = 5, retry_delay: float = 30, max_batches: int = 20):
+        self.db = db
+        self.transport = transport
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_batches = max_batches
+        self.sent = 0
+        self.failed = 0
+        self.dead = 0
+        self.batches = 0
+        self.send_time = 0.0
+        self.queue_lag: Optional[float] = None
+    
+    def dispatch(self) -> int:
+        """Send due notifications until the outbox is drained or max_batches is reached"""
+        sent = 0
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for _ in range(self.max_batches):
+                batch = self.db.get_due_notifications(datetime.now(timezone.utc).isoformat(), self.batch_size)
+                self._record_lag(batch)
+                if not batch:
+                    break
+                sent += self._send_batch(batch, pool)
+                if len(batch) < self.batch_size:
+                    break
+        return sent
+    
+    def _send_batch(self, batch: List[Dict[str, Any]], pool: ThreadPoolExecutor) -> int:
+        start = time.perf_counter()
+        usernames = self.db.get_usernames(list({n["user_id"] for n in batch if n.get("user_id")}))
+        
+        def send(notification):
+            subject, body = render_message(notification["kind"], notification.get("payload") or {})
+            self.transport.send(usernames.get(notification.get("user_id"), ""), subject, body)
+        
+        futures = [(n, pool.submit(send, n)) for n in batch]
+        delivered = []
+        for notification, future in futures:
+            try:
+                future.result()
+                delivered.append(notification["id"])
+            except Exception as e:
+                self._retry(notification, e)
+        
+        if delivered:
+            self.db.mark_notifications_sent(delivered)
+        self.sent += len(delivered)
+        self.batches += 1
+        self.send_time += time.perf_counter() - start
+        return len(delivered)
+    
+    def _retry(self, notification: Dict[str, Any], error: Exception) -> None:
+        attempts = (notification.get("attempts") or 0) + 1
+        dead = attempts >= self.max_attempts
+        delay = self.retry_delay * 2 ** (attempts - 1)
+        next_attempt = (datetime.now(timezone.utc) + timedelta(seconds=delay)).isoformat()
+        self.db.reschedule_notification(notification["id"], attempts, next_attempt, str(error), dead)
+        self.failed += 1
+        self.dead += dead
+    
+    def _record_lag(self, batch: List[Dict[str, Any]]) -> None:
+        """Queue lag: how long the oldest due notification has been waiting"""
+        if not batch:
+            self.queue_lag = 0.0
+            return
+        created = parse_timestamp(batch[0]["created_at"])
+        self.queue_lag = (datetime.now(timezone.utc) - created).total_seconds() if created else 0.0
+    
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "dead_lettered": self.dead,
+            "batches": self.batches,
+            "throughput_per_sec": round(self.sent / self.send_time, 2) if self.send_time else None,
+            "queue_lag_seconds": None if self.queue_lag is None else round(self.queue_lag, 3),
+        }
+
+def plan_reminders(db: Database, within_minutes: int) -> int:
+    """Queue one reminder for every confirmed booking starting within the next N minutes
+    
+    Runs as a single range query; the per-booking dedupe key keeps repeated passes
+    from queueing the same reminder twice.
+    """
+    now = datetime.now(timezone.utc)
+    bookings = db.get_bookings_starting_between(now.isoformat(), (now + timedelta(minutes=within_minutes)).isoformat())
+    rows = [{
+        "kind": "booking_reminder",
+        "booking_id": b.id,
+        "user_id": b.user_id,
+        "dedupe_key": f"booking_reminder:{b.id}",
+        "payload": {
+            "vehicle_number": b.vehicle_number,
+            "location": b.charging_slots.location if b.charging_slots else None,
+            "slot_number": b.charging_slots.slot_number if b.charging_slots else None,
+            "start_time": b.start_time.isoformat() if b.start_time else None,
+        },
+    } for b in bookings]
+    return db.enqueue_notifications(rows)
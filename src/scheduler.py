@@ -0,0 +1,127 @@
+import asyncio
+import os
+import random
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from . import filelock
+
+DEFAULT_LOCK_DIR = os.path.join(tempfile.gettempdir(), "ev_booking_jobs")
+
+class Job:
+    """A periodic job and its timing metrics"""
+    
+    def __init__(self, name: str, func: Callable[[], Any], interval: float, jitter: float = 0.1,
+                 exclusive: bool = True):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.exclusive = exclusive
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.total_duration = 0.0
+        self.last_duration: Optional[float] = None
+        self.last_run_at: Optional[float] = None
+        self.last_result: Any = None
+        self.last_error: Optional[str] = None
+    
+    def next_delay(self) -> float:
+        """Interval with random jitter so workers and jobs don't fire in lockstep"""
+        return self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+    
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "interval": self.interval,
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "last_duration_ms": None if self.last_duration is None else round(self.last_duration * 1000, 2),
+            "avg_duration_ms": round(self.total_duration / self.runs * 1000, 2) if self.runs else None,
+            "last_run_at": self.last_run_at,
+            "last_result": self.last_result,
+            "last_error": self.last_error,
+        }
+
+class Scheduler:
+    """In-process asyncio scheduler for periodic background jobs
+    
+    Job functions are blocking and run in the default executor. When several API
+    workers run the same scheduler, a per-job lock file makes sure each exclusive
+    job runs at most once per interval across all of them: the worker holding the
+    lock records the run time in the file, and workers finding a recent run skip
+    their turn. Non-exclusive jobs maintain per-process state and run in every worker.
+    """
+    
+    def __init__(self, lock_dir: str = None):
+        self.lock_dir = lock_dir or os.getenv("SCHEDULER_LOCK_DIR", DEFAULT_LOCK_DIR)
+        self.jobs: Dict[str, Job] = {}
+        self._tasks: List[asyncio.Task] = []
+    
+    def add_job(self, name: str, func: Callable[[], Any], interval: float, jitter: float = 0.1,
+                exclusive: bool = True) -> Job:
+        job = Job(name, func, interval, jitter, exclusive)
+        self.jobs[name] = job
+        return job
+    
+    def start(self) -> None:
+        os.makedirs(self.lock_dir, exist_ok=True)
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._loop(job)) for job in self.jobs.values()]
+    
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+    
+    async def _loop(self, job: Job) -> None:
+        while True:
+            await asyncio.sleep(job.next_delay())
+            await self.run_job(job)
+    
+    async def run_job(self, job: Job) -> None:
+        """Run a job once, unless another worker holds it or ran it within this interval"""
+        loop = asyncio.get_running_loop()
+        fd = os.open(os.path.join(self.lock_dir, f"{job.name}.lock"), os.O_RDWR | os.O_CREAT, 0o600)
+        locked = False
+        try:
+            if job.exclusive:
+                if not filelock.lock(fd, blocking=False):
+                    job.skipped += 1
+                    return
+                locked = True
+                os.lseek(fd, 0, os.SEEK_SET)
+                last_run = os.read(fd, 32).decode().strip()
+                if last_run and time.time() - float(last_run) < job.interval * (1 - job.jitter):
+                    job.skipped += 1
+                    return
+            
+            start = time.perf_counter()
+            try:
+                result = await loop.run_in_executor(None, job.func)
+                # Keep only scalar results (e.g. row counts) for the metrics
+                job.last_result = result if isinstance(result, (int, float, str)) else None
+                job.last_error = None
+            except Exception as e:
+                job.failures += 1
+                job.last_error = str(e)
+                print(f"Error running job {job.name}: {e}")
+            finally:
+                job.last_duration = time.perf_counter() - start
+                job.total_duration += job.last_duration
+                job.runs += 1
+                job.last_run_at = time.time()
+                if job.exclusive:
+                    os.ftruncate(fd, 0)
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    os.write(fd, str(job.last_run_at).encode())
+        finally:
+            if locked:
+                filelock.unlock(fd)
+            os.close(fd)
+    
+    def metrics(self) -> Dict[str, Any]:
+        return {name: job.metrics() for name, job in self.jobs.items()}
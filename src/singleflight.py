@@ -0,0 +1,96 @@
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+class SingleFlight:
+    """Coalesce identical concurrent calls into one in-flight call whose result all callers share
+
+    The first caller for a key (the leader) runs the function; everyone arriving while
+    it runs waits for the same result, or exception. Threads block on the shared future
+    while coroutines await it, so both kinds of caller can join the same flight.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def _join(self, key: Hashable) -> Tuple[Future, bool]:
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                return flight, False
+            flight = Future()
+            self._flights[key] = flight
+            return flight, True
+
+    def _lead(self, key: Hashable, flight: Future, name: str, func: Callable[[], Any]) -> Any:
+        try:
+            result = func()
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+                self._record(name, leader=True)
+
+    def _record(self, name: str, leader: bool, waited: float = 0.0) -> None:
+        stats = self._stats.setdefault(name, {"calls": 0, "coalesced": 0, "wait_total_ms": 0.0, "wait_max_ms": 0.0})
+        stats["calls"] += 1
+        if not leader:
+            stats["coalesced"] += 1
+            stats["wait_total_ms"] += waited * 1000
+            stats["wait_max_ms"] = max(stats["wait_max_ms"], waited * 1000)
+
+    def _waited(self, name: str, started: float) -> None:
+        with self._lock:
+            self._record(name, leader=False, waited=time.monotonic() - started)
+
+    def do(self, key: Hashable, name: str, func: Callable[[], Any]) -> Any:
+        """Run func, or wait for the identical call already in flight"""
+        flight, leader = self._join(key)
+        if leader:
+            return self._lead(key, flight, name, func)
+        started = time.monotonic()
+        try:
+            return flight.result()
+        finally:
+            self._waited(name, started)
+
+    async def do_async(self, key: Hashable, name: str, func: Callable[[], Any]) -> Any:
+        """Like do(), but awaits the flight; a leading coroutine runs func in the default executor"""
+        flight, leader = self._join(key)
+        if leader:
+            loop = asyncio.get_running_loop()
+            # run_in_executor does not carry context variables over, so copy them explicitly
+            call = functools.partial(contextvars.copy_context().run, self._lead, key, flight, name, func)
+            return await loop.run_in_executor(None, call)
+        started = time.monotonic()
+        try:
+            return await asyncio.wrap_future(flight)
+        finally:
+            self._waited(name, started)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Per-read call counts and how long coalesced callers waited on a shared flight"""
+        with self._lock:
+            in_flight = len(self._flights)
+            reads = {}
+            for name, stats in self._stats.items():
+                coalesced = stats["coalesced"]
+                reads[name] = {
+                    "calls": stats["calls"],
+                    "upstream_calls": stats["calls"] - coalesced,
+                    "coalesced": coalesced,
+                    "wait_avg_ms": round(stats["wait_total_ms"] / coalesced, 2) if coalesced else 0.0,
+                    "wait_max_ms": round(stats["wait_max_ms"], 2),
+                }
+        return {"in_flight": in_flight, "reads": reads}
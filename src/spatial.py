@@ -0,0 +1,163 @@
+import heapq
+import math
+import threading
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+from .models import Slot
+
+EARTH_RADIUS_KM = 6371.0
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in kilometres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi, dlmb = phi2 - phi1, math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+class SlotIndex:
+    """Uniform lat/lon grid over available slots for k-nearest charger queries
+    
+    Only available slots with coordinates are stored in the grid, so a query
+    visits the cells in rings around the query point and stops as soon as no
+    unvisited cell can hold anything closer than the k-th best match or the
+    radius. Longitude cells wrap at ±180°, so cell_size must divide 360. The
+    index is updated in place from Database change events (see apply).
+    """
+    
+    def __init__(self, cell_size: float = 0.05):
+        self.cell_size = cell_size
+        self._lon_cells = round(360 / cell_size)
+        self._slots: Dict[str, Slot] = {}
+        self._cells: Dict[Tuple[int, int], Set[str]] = {}
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._slots)
+    
+    def _wrap(self, j: int) -> int:
+        half = self._lon_cells // 2
+        return (j + half) % self._lon_cells - half
+    
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.cell_size), self._wrap(math.floor(lon / self.cell_size)))
+    
+    def _place(self, slot: Slot) -> None:
+        if slot.is_available and slot.latitude is not None and slot.longitude is not None:
+            self._cells.setdefault(self._cell(slot.latitude, slot.longitude), set()).add(slot.id)
+    
+    def _unplace(self, slot: Slot) -> None:
+        if slot.latitude is None or slot.longitude is None:
+            return
+        cell = self._cell(slot.latitude, slot.longitude)
+        members = self._cells.get(cell)
+        if members:
+            members.discard(slot.id)
+            if not members:
+                del self._cells[cell]
+    
+    def rebuild(self, slots: Iterable[Slot]) -> None:
+        with self._lock:
+            self._slots = {slot.id: slot for slot in slots}
+            self._cells = {}
+            for slot in self._slots.values():
+                self._place(slot)
+    
+    def upsert(self, slot: Slot) -> None:
+        with self._lock:
+            old = self._slots.get(slot.id)
+            if old:
+                self._unplace(old)
+            self._slots[slot.id] = slot
+            self._place(slot)
+    
+    def remove(self, slot_id: str) -> None:
+        with self._lock:
+            old = self._slots.pop(slot_id, None)
+            if old:
+                self._unplace(old)
+    
+    def set_available(self, slot_id: str, is_available: bool) -> None:
+        slot = self._slots.get(slot_id)
+        if slot and slot.is_available != is_available:
+            self.upsert(slot.with_availability(is_available))
+    
+    def apply(self, event: str, data: Dict[str, Any]) -> None:
+        """Database / EventLog change listener; replayed events carry slots as dicts"""
+        if event == "slot_created":
+            slot = data["slot"]
+            self.upsert(slot if isinstance(slot, Slot) else Slot.from_row(slot))
+        elif event == "slot_deleted":
+            for slot_id in data["slot_ids"]:
+                self.remove(slot_id)
+        elif event == "slot_availability":
+            for slot_id in data["slot_ids"]:
+                self.set_available(slot_id, data["is_available"])
+    
+    def nearest(self, lat: float, lon: float, radius_km: float, limit: int) -> List[Tuple[float, Slot]]:
+        """Up to `limit` available slots within radius_km, closest first, as (distance_km, slot)"""
+        # Bounding box of the search circle in cells; it spans every longitude once it reaches a pole
+        angular = radius_km / EARTH_RADIUS_KM
+        lat_rings = math.ceil(math.degrees(angular) / self.cell_size)
+        if abs(math.radians(lat)) + angular < math.pi / 2:
+            lon_span = math.degrees(math.asin(math.sin(angular) / math.cos(math.radians(lat))))
+            lon_rings = min(math.ceil(lon_span / self.cell_size), self._lon_cells // 2)
+        else:
+            lon_rings = self._lon_cells // 2
+        
+        ci, cj = self._cell(lat, lon)
+        best: List[Tuple[float, str]] = []  # max-heap of (-distance, slot_id)
+        with self._lock:
+            seen: Set[Tuple[int, int]] = set()
+            for ring in range(max(lat_rings, lon_rings) + 1):
+                if len(seen) > len(self._cells):
+                    # Sparse grid: checking the occupied cells left is cheaper than walking more rings
+                    for cell, members in self._cells.items():
+                        if cell not in seen:
+                            self._consider(best, members, lat, lon, radius_km, limit)
+                    break
+                for di, dj in self._ring(ring, lat_rings, lon_rings):
+                    cell = (ci + di, self._wrap(cj + dj))
+                    if cell in seen:
+                        continue
+                    seen.add(cell)
+                    self._consider(best, self._cells.get(cell, ()), lat, lon, radius_km, limit)
+                # Every cell beyond this ring is at least this far away
+                bound = self._ring_bound(lat, ring)
+                if bound > radius_km or (len(best) >= limit and -best[0][0] <= bound):
+                    break
+            return [(-neg, self._slots[slot_id]) for neg, slot_id in sorted(best, reverse=True)]
+    
+    def _consider(self, best: List[Tuple[float, str]], slot_ids: Iterable[str], lat: float, lon: float,
+                  radius_km: float, limit: int) -> None:
+        for slot_id in slot_ids:
+            slot = self._slots[slot_id]
+            distance = haversine_km(lat, lon, slot.latitude, slot.longitude)
+            if distance > radius_km:
+                continue
+            if len(best) < limit:
+                heapq.heappush(best, (-distance, slot_id))
+            elif distance < -best[0][0]:
+                heapq.heapreplace(best, (-distance, slot_id))
+    
+    def _ring_bound(self, lat: float, ring: int) -> float:
+        """Lower bound on the distance from (lat, ·) to any cell more than `ring` cells away"""
+        step = math.radians(ring * self.cell_size)
+        lat_km = EARTH_RADIUS_KM * step
+        # Great-circle distance to a point `step` of longitude away, at whatever latitude
+        lon_km = EARTH_RADIUS_KM * math.asin(math.sin(min(step, math.pi / 2)) * math.cos(math.radians(lat)))
+        return min(lat_km, lon_km)
+    
+    @staticmethod
+    def _ring(ring: int, max_di: int, max_dj: int) -> Iterable[Tuple[int, int]]:
+        """Cell offsets at Chebyshev distance `ring`, clipped to |di| <= max_di and |dj| <= max_dj"""
+        if ring == 0:
+            yield (0, 0)
+            return
+        if ring <= max_di:
+            for dj in range(-min(ring, max_dj), min(ring, max_dj) + 1):
+                yield (-ring, dj)
+                yield (ring, dj)
+        if ring <= max_dj:
+            for di in range(-min(ring - 1, max_di), min(ring - 1, max_di) + 1):
+                yield (di, -ring)
+                yield (di, ring)